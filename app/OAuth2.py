@@ -1,12 +1,22 @@
+import asyncio
+import threading
+import time
+import uuid
 from fastapi import HTTPException, status
 import jwt
 from passlib.context import CryptContext
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
 from app import models
 from datetime import datetime, timedelta, timezone
 
+from app.cache import TTLCache
+from app.crud.auth import add_revoked_token, get_database_now, get_revoked_tokens
 from app.schemas import TokenData
 from .config import settings
+from .workers import hashing_executor
 
 SECRET_KEY = settings.secret_key
 ALGORITHM = settings.algorithm
@@ -14,11 +24,43 @@ ACCESS_TOKEN_EXPIRE_MINUTES = settings.access_token_expire_min
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+hashing_metrics = {
+    "pending": 0, # running + waiting for a thread
+    "max_pending": 0,
+    "done": 0,
+    "rejected": 0,
+}
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def run_hashing(function, *args):
+    # only called from the event loop => the counters need no lock
+    if hashing_metrics["pending"] >= settings.hashing_max_pending:
+        hashing_metrics["rejected"] += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many authentication requests, try again later",
+            headers={"Retry-After": "1"},
+        )
+
+    hashing_metrics["pending"] += 1
+    hashing_metrics["max_pending"] = max(hashing_metrics["max_pending"], hashing_metrics["pending"])
+    try:
+        return await asyncio.get_running_loop().run_in_executor(hashing_executor, function, *args)
+    finally:
+        hashing_metrics["pending"] -= 1
+        hashing_metrics["done"] += 1
+
+def get_hashing_metrics():
+    return {
+        **hashing_metrics,
+        "workers": settings.hashing_workers,
+        "queue_depth": max(hashing_metrics["pending"] - settings.hashing_workers, 0),
+    }
+
+async def verify_password(plain_password, hashed_password):
+    return await run_hashing(pwd_context.verify, plain_password, hashed_password)
+
+async def get_password_hash(password):
+    return await run_hashing(pwd_context.hash, password)
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
@@ -26,14 +68,59 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
         expire = datetime.now(timezone.utc) + expires_delta
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex}) # jti: id used to revoke the token
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+# email => employee (detached from its session), saves the select of every authenticated request
+# each worker has its own: the writes of other workers are seen after at most principal_cache_ttl
+principal_cache = TTLCache(settings.principal_cache_size, settings.principal_cache_ttl)
+
+def invalidate_principal(email: str | None = None):
+    # to call when an employee changes, email None => unknown employee, drop them all
+    if email is None:
+        principal_cache.clear()
+    else:
+        principal_cache.pop(email)
+
 def get_employee(db, email):
     return db.query(models.Employee).filter(models.Employee.email == email).first()
 
-def get_curr_employee(db, token):
+# jti => expiration timestamp of the revoked tokens not expired yet (so at most access_token_expire_min of revocations)
+# checking a token is a dict lookup, the table is only read every revocation_refresh_interval
+revoked_tokens = {}
+revocation_refresh = {"next": 0.0, "since": None}
+revocation_refresh_lock = threading.Lock()
+
+def refresh_revoked_tokens(db):
+    # loads the revocations made (by any worker) since the previous refresh and forgets the expired ones
+    if time.monotonic() < revocation_refresh["next"] or not revocation_refresh_lock.acquire(blocking=False):
+        return
+
+    try:
+        # watermark from the db clock, compared with created_on (set by the db)
+        started_on = get_database_now(db)
+        for jti, expires_on in get_revoked_tokens(db, revocation_refresh["since"]):
+            revoked_tokens[jti] = expires_on.timestamp()
+
+        now = time.time()
+        for jti, expires_at in list(revoked_tokens.items()):
+            if expires_at < now:
+                revoked_tokens.pop(jti, None)
+
+        # overlap with the previous refresh: rows of transactions committed after it started
+        revocation_refresh["since"] = started_on - timedelta(seconds=settings.revocation_refresh_interval + 60)
+        revocation_refresh["next"] = time.monotonic() + settings.revocation_refresh_interval
+    finally:
+        revocation_refresh_lock.release()
+
+def revoke_token(db, payload: dict):
+    expires_on = datetime.fromtimestamp(payload["exp"])
+    add_revoked_token(db, payload["jti"], expires_on)
+    db.commit()
+    revoked_tokens[payload["jti"]] = expires_on.timestamp()
+
+def decode_token(db, token):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -44,21 +131,43 @@ def get_curr_employee(db, token):
         email: str = payload.get("email")
         if email is None:
             raise credentials_exception
-        token_data = TokenData(email=email)
     except jwt.InvalidTokenError:
         raise credentials_exception
-    employee = get_employee(db, token_data.email)
-    if employee is None:
+
+    refresh_revoked_tokens(db)
+    if payload.get("jti") in revoked_tokens:
         raise credentials_exception
+
+    return payload
+
+def get_curr_employee(db, token):
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    token_data = TokenData(email=decode_token(db, token)["email"])
+    employee = principal_cache.get(token_data.email)
+    if employee is None:
+        employee = get_employee(db, token_data.email)
+        if employee is None:
+            raise credentials_exception
+        db.expunge(employee)
+        principal_cache.set(token_data.email, employee)
     return employee
 
-def authenticate_employee(db, email, password):
-    employee = get_employee(db, email)
+async def authenticate_employee(db: AsyncSession, email, password):
+    employee = await db.scalar(select(models.Employee).options(selectinload(models.Employee.roles)).where(models.Employee.email == email))
 
     if not employee:
         return False
-    
-    if not verify_password(password, employee.password):
+
+    hashed_password = employee.password
+    # give the connection back to the pool while waiting for bcrypt, a login burst would exhaust it
+    # (detached first so the loaded employee and roles stay readable)
+    db.expunge_all()
+    await db.rollback()
+    if not await verify_password(password, hashed_password):
         return False
     
     return employee
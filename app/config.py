@@ -11,9 +11,60 @@ class Settings(BaseSettings):
     mail_password: str
     mail_from: str
     mail_server: str
+    mail_port: int = 465
+    mail_ssl_tls: bool = True
+    mail_starttls: bool = False
+    mail_use_credentials: bool = True
+    mail_validate_certs: bool = True
+    mail_pool_size: int = 2 # smtp connections kept open, a batch is sent over all of them in parallel
+    mail_connection_max_messages: int = 100 # then the connection is renewed (servers cap the messages per session)
+    mail_connection_idle_timeout: int = 60 # seconds, servers drop idle sessions: older ones are closed instead of reused
     secret_key: str
     algorithm: str
     access_token_expire_min: int
+    db_pool_size: int = 5 # per engine and per worker
+    db_max_overflow: int = 10
+    db_pool_timeout: int = 30 # seconds waiting for a free connection before failing
+    db_pool_recycle: int = 1800 # seconds, reconnect before the server or a proxy drops idle connections
+    db_pool_pre_ping: bool = True # checks the connection on checkout (a restarted database doesn't fail requests)
+    db_statement_timeout: int = 30000 # ms, 0 => no timeout
+    database_replica_hostname: str = "" # read only routes go to that replica when set
+    database_replica_port: str = "" # database_port when empty
+    replica_lag_window: int = 5 # seconds a client's reads stay on the primary after its last write
+    import_workers: int = 2
+    import_chunk_size: int = 500
+    import_heartbeat_interval: int = 10 # seconds between two heartbeats of the unfinished jobs of a worker
+    import_heartbeat_timeout: int = 60 # seconds without heartbeat => the owner is dead, the job is failed
+    bulk_insert_min_rows: int = 1000 # smaller imports go through the orm
+    validation_processes: int = 0 # > 1 to validate big imports in parallel processes
+    parallel_validation_min_rows: int = 20000
+    validation_cache_size: int = 200000 # lines
+    validation_cache_ttl: int = 900 # seconds
+    unique_keys_cache_ttl: int = 60 # seconds
+    hashing_workers: int = 2 # bcrypt threads, bcrypt releases the gil
+    hashing_max_pending: int = 64 # more waiting hashes => 503
+    principal_cache_size: int = 10000 # employees
+    principal_cache_ttl: int = 30 # seconds, bounds the staleness across workers
+    revocation_refresh_interval: int = 5 # seconds, revocations made by other workers are seen after that
+    code_expire_seconds: int = 3600 # account activation and reset password codes
+    code_retention_hours: int = 24 # used/expired codes are kept that long after expiring then purged
+    retention_interval: int = 600 # seconds between two purges
+    retention_batch_size: int = 1000
+    outbox_poll_interval: float = 1 # seconds between two looks at an empty outbox
+    outbox_batch_size: int = 50 # emails claimed at once
+    outbox_max_attempts: int = 8 # then the email is dead lettered
+    outbox_backoff_base: int = 30 # seconds before the 2nd attempt, doubled after each failure
+    outbox_backoff_max: int = 3600
+    outbox_lease_seconds: int = 300 # a claimed email without result after that (crashed worker) is retried
+    # route => "hits/seconds", sliding window, json in the env to change them
+    rate_limits_per_ip: dict[str, str] = {"token": "30/60", "forgotPassword": "10/3600", "imports": "30/60", "export": "10/60"}
+    rate_limits_per_account: dict[str, str] = {"token": "10/300", "forgotPassword": "3/3600", "imports": "10/60", "export": "3/60"}
+    count_cache_ttl: int = 10 # seconds
+    name_index_ttl: int = 30 # seconds, the in memory name index (non postgres databases) sees the other processes' writes after that
+    estimated_count_min_rows: int = 100000 # smaller tables are counted even when an estimate is asked
+    export_batch_size: int = 1000 # rows per fetch of the export cursor (and per roles query)
+    table_version_ttl: int = 2 # seconds, etags change that long after an employee write of another process
+    import_report_inline_issues: int = 200 # more issues than that => compact report, paginated by /employee/imports/reports/{id}
     
     model_config = SettingsConfigDict(env_file=".env")
 
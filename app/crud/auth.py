@@ -1,30 +1,102 @@
+import base64
+import hashlib
+import hmac
+import time
+from collections import namedtuple
+from datetime import datetime
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-import uuid
 from app import models, enums
+from app.config import settings
 
 
+# activation/reset codes: "<row id>.<expiration timestamp>.<hmac>", checked without reading the database
+ACTIVATION_CODE = "activation"
+RESET_CODE = "reset"
+
+SignedCode = namedtuple("SignedCode", ["id", "expires_at"])
+
+def code_signature(kind: str, payload: str):
+    digest = hmac.new(settings.secret_key.encode(), f"{kind}.{payload}".encode(), hashlib.sha256).digest()[:16]
+    return base64.urlsafe_b64encode(digest).rstrip(b'=').decode()
+
+def sign_code(kind: str, id: int):
+    payload = f"{id}.{int(time.time()) + settings.code_expire_seconds}"
+    return f"{payload}.{code_signature(kind, payload)}"
+
+def read_code(kind: str, code: str):
+    # SignedCode of a well formed code signed for this kind, None for junk or tampered codes
+    parts = code.split('.')
+    if len(parts) != 3:
+        return None
+    try:
+        signed_code = SignedCode(int(parts[0]), int(parts[1]))
+    except ValueError:
+        return None
+    if not hmac.compare_digest(parts[2], code_signature(kind, f"{parts[0]}.{parts[1]}")):
+        return None
+
+    return signed_code
+
 # confirm account code
-def get_confirmation_code(db: Session, code: str):
-    return db.query(models.AccountActivation).filter(models.AccountActivation.token == code).first()
+async def get_confirmation_code(db: AsyncSession, id: int):
+    return await db.get(models.AccountActivation, id)
 
-def add_confirmation_code(db: Session, id: int, email: str):
-    activation_code = models.AccountActivation(employee_id=id, email=email, status=enums.TokenStatus.Pending, token=uuid.uuid1())
+async def add_confirmation_code(db: AsyncSession, id: int, email: str):
+    activation_code = models.AccountActivation(employee_id=id, email=email, status=enums.TokenStatus.Pending)
     db.add(activation_code)
+    await db.flush() # the code carries the id
 
     return activation_code
 
-def edit_confirmation_code(db: Session, id: int, new_data: dict):
-    db.query(models.AccountActivation).filter(models.AccountActivation.id == id).update(new_data, synchronize_session=False)
+async def edit_confirmation_code(db: AsyncSession, id: int, new_data: dict):
+    await db.execute(update(models.AccountActivation).where(models.AccountActivation.id == id).values(new_data).execution_options(synchronize_session=False))
 
 # reset psw code
-def get_reset_code(db: Session, code: str):
-    return db.query(models.ResetPassword).filter(models.ResetPassword.token == code).first()
+async def get_reset_code(db: AsyncSession, id: int):
+    return await db.get(models.ResetPassword, id)
 
-def add_reset_code(db: Session, db_employee: models.Employee):
-    reset_code = models.ResetPassword(employee_id=db_employee.id, email=db_employee.email, status=enums.TokenStatus.Pending, token=uuid.uuid1())
+async def add_reset_code(db: AsyncSession, db_employee: models.Employee):
+    reset_code = models.ResetPassword(employee_id=db_employee.id, email=db_employee.email, status=enums.TokenStatus.Pending)
     db.add(reset_code)
+    await db.flush() # the code carries the id
 
     return reset_code
 
-def edit_reset_code(db: Session, id: int, new_data: dict):
-    db.query(models.ResetPassword).filter(models.ResetPassword.id == id).update(new_data, synchronize_session=False)
+async def edit_reset_code(db: AsyncSession, id: int, new_data: dict):
+    await db.execute(update(models.ResetPassword).where(models.ResetPassword.id == id).values(new_data).execution_options(synchronize_session=False))
+
+# revoked jwt
+def add_revoked_token(db: Session, jti: str, expires_on: datetime):
+    revoked_token = models.JwtBlacklist(token=jti, expires_on=expires_on)
+    db.add(revoked_token)
+
+    return revoked_token
+
+def get_database_now(db: Session):
+    # clock of the rows' server defaults (created_on): the app clock may be skewed or in another timezone
+    return db.scalar(select(func.now()))
+
+def get_revoked_tokens(db: Session, since: datetime | None):
+    # (jti, expires_on) of the tokens revoked since `since` and not expired yet
+    query = db.query(models.JwtBlacklist.token, models.JwtBlacklist.expires_on).filter(models.JwtBlacklist.expires_on > datetime.now())
+    if since:
+        query = query.filter(models.JwtBlacklist.created_on >= since)
+
+    return query.all()
+
+def delete_in_batches(db: Session, model, condition, batch_size: int):
+    """
+    delete the rows of model matching condition, batch_size rows per transaction:
+    short transactions => rows locks are held briefly, no long lock on the table
+    returns the number of deleted rows
+    """
+    deleted = 0
+    while True:
+        ids = select(model.id).where(condition).limit(batch_size).scalar_subquery()
+        count = db.query(model).filter(model.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+        deleted += count
+        if count < batch_size:
+            return deleted
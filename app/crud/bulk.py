@@ -0,0 +1,34 @@
+import csv
+import enum
+import io
+
+from sqlalchemy import Table
+from sqlalchemy.orm import Session
+
+
+def to_copy_value(value):
+    # csv module writes str(value): enums would become "RoleType.ADMIN" (sqlalchemy stores their name), None an unquoted empty field => NULL
+    return value.name if isinstance(value, enum.Enum) else value
+
+def copy_rows(db: Session, table: Table, rows: list[dict]):
+    """
+    bulk load rows (dicts having the same keys) into table inside the session transaction:
+    COPY FROM STDIN on postgres, one executemany insert on other databases
+    """
+    if not rows:
+        return
+
+    connection = db.connection()
+    if connection.dialect.name != "postgresql":
+        connection.execute(table.insert(), rows)
+        return
+
+    columns = list(rows[0].keys())
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([to_copy_value(row[column]) for column in columns])
+    buffer.seek(0)
+
+    with connection.connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
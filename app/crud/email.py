@@ -0,0 +1,75 @@
+from collections import namedtuple
+from datetime import timedelta
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+from app import models, enums
+from app.config import settings
+from app.dependencies import PagiantionParams
+
+OutboxEmail = namedtuple("OutboxEmail", ["id", "recipients", "body", "template", "attempts"])
+
+# written in the transaction of the change the email is about: sent once committed, never if rolled back
+def add_outbox_email(db, recipients: list[str], body: dict, template: enums.EmailTemplate):
+    # db.add only => sync and async sessions
+    email = models.EmailOutbox(recipients=recipients, body=body, template=template, status=enums.EmailStatus.Pending, attempts=0)
+    db.add(email)
+
+    return email
+
+def add_outbox_emails(db: Session, messages: list[tuple[list[str], dict]], template: enums.EmailTemplate):
+    # imports: one multi-row insert for the whole chunk
+    if messages:
+        db.execute(insert(models.EmailOutbox.__table__), [
+            {'recipients': recipients, 'body': body, 'template': template, 'status': enums.EmailStatus.Pending, 'attempts': 0}
+            for recipients, body in messages
+        ])
+
+def claim_outbox_emails(db: Session, batch_size: int):
+    """
+    due emails leased to the caller for outbox_lease_seconds (the caller commits then sends)
+    rows locked by another worker are skipped, a crashed worker's emails come back once the lease is over
+    times are on the database clock (func.now()) like the next_attempt_on default: the app clock may be skewed or in another timezone
+    """
+    emails = db.query(models.EmailOutbox).filter(
+        models.EmailOutbox.status == enums.EmailStatus.Pending,
+        models.EmailOutbox.next_attempt_on <= func.now(),
+    ).order_by(models.EmailOutbox.next_attempt_on).limit(batch_size).with_for_update(skip_locked=True).all()
+
+    for email in emails:
+        email.attempts += 1
+        email.next_attempt_on = func.now() + timedelta(seconds=settings.outbox_lease_seconds)
+
+    return [OutboxEmail(email.id, email.recipients, email.body, email.template, email.attempts) for email in emails]
+
+def email_retry_delay(attempts: int):
+    # exponential backoff: base, 2 * base, 4 * base... up to outbox_backoff_max
+    return timedelta(seconds=min(settings.outbox_backoff_base * 2 ** (attempts - 1), settings.outbox_backoff_max))
+
+def record_email_attempt(db: Session, email: OutboxEmail, error: str | None):
+    if error is None:
+        new_data = {models.EmailOutbox.status: enums.EmailStatus.Sent, models.EmailOutbox.sent_on: func.now(), models.EmailOutbox.last_error: None}
+    elif email.attempts >= settings.outbox_max_attempts:
+        new_data = {models.EmailOutbox.status: enums.EmailStatus.Dead, models.EmailOutbox.last_error: error}
+    else:
+        new_data = {models.EmailOutbox.next_attempt_on: func.now() + email_retry_delay(email.attempts), models.EmailOutbox.last_error: error}
+
+    db.query(models.EmailOutbox).filter(models.EmailOutbox.id == email.id).update(new_data, synchronize_session=False)
+
+def get_outbox_emails(db: Session, status: enums.EmailStatus | None, pagination_param: PagiantionParams):
+    query = db.query(models.EmailOutbox)
+    if status:
+        query = query.filter(models.EmailOutbox.status == status)
+
+    total_records = query.count()
+    emails = query.order_by(models.EmailOutbox.id.desc()).limit(pagination_param.page_size).offset((pagination_param.page_number - 1) * pagination_param.page_size).all()
+
+    return emails, total_records
+
+def resend_outbox_email(db: Session, id: int):
+    # dead or sent: back in the queue with a fresh attempts budget, returns False for an unknown id
+    return db.query(models.EmailOutbox).filter(models.EmailOutbox.id == id).update({
+        models.EmailOutbox.status: enums.EmailStatus.Pending,
+        models.EmailOutbox.attempts: 0,
+        models.EmailOutbox.next_attempt_on: func.now(),
+        models.EmailOutbox.last_error: None,
+    }, synchronize_session=False) > 0
@@ -1,13 +1,24 @@
+import base64
+import json
+from collections import defaultdict
+from datetime import datetime
 from fastapi import HTTPException
-from sqlalchemy import func
+from sqlalchemy import Boolean, Column, Integer, MetaData, Table, func, insert, literal, select, text, tuple_, union_all, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.OAuth2 import get_password_hash
+from app.OAuth2 import get_password_hash, invalidate_principal, verify_password
 
 from app import models, schemas, enums
-from app.crud.auth import add_confirmation_code
+from app.cache import TTLCache
+from app.config import settings
+from app.crud.auth import ACTIVATION_CODE, add_confirmation_code, sign_code
+from app.crud.bulk import copy_rows
+from app.crud.email import add_outbox_email
+from app.crud.search import filter_by_name, name_index, normalize_name
+from app.crud.version import EMPLOYEES, bump_table_version, bump_table_version_async
+from app.database import on_commit
 from app.dependencies import PagiantionParams
-from app.external_services import emailService
 
 error_keys = {
     "employee_roles_employee_id_fkey": "No Employee with this id",
@@ -22,11 +33,12 @@ def get_employee(db: Session, id: int):
     return db.query(models.Employee).filter(models.Employee.id == id).first()
 
 # to refactor later
-def get_employee_by_email(db: Session, email: str):
-    return db.query(models.Employee).filter(models.Employee.email == email).first()
+async def get_employee_by_email(db: AsyncSession, email: str):
+    return await db.scalar(select(models.Employee).where(models.Employee.email == email))
 
-def sudo_edit_employee(db: Session, id: int, new_data: dict):
-    db.query(models.Employee).filter(models.Employee.id == id).update(new_data, synchronize_session=False)
+async def sudo_edit_employee(db: AsyncSession, id: int, new_data: dict):
+    await db.execute(update(models.Employee).where(models.Employee.id == id).values(new_data).execution_options(synchronize_session=False))
+    on_commit(db, invalidate_principal)
 
 # to move to common place
 def div_ceil(nominator, denominator):
@@ -34,44 +46,247 @@ def div_ceil(nominator, denominator):
     additional_page = 1 if nominator % denominator > 0 else 0
     return full_pages + additional_page
 
-def get_employees(db: Session, pagination_param: PagiantionParams, name_substr: str):
-    query = db.query(models.Employee)
+# columns of schemas.EmployeeOut: the list reads rows, not orm instances (identity map, lazy roles)
+employee_out_columns = [getattr(models.Employee, field) for field in schemas.EmployeeOut.model_fields if field != 'roles']
 
-    if name_substr:
-        query = query.filter(func.lower(func.concat(models.Employee.first_name, ' ', models.Employee.last_name)).contains(func.lower(name_substr)))
+def employees_query(db: Session, name_substr: str, by_relevance: bool = True):
+    query = db.query(*employee_out_columns)
+
+    if name_substr and name_substr.strip():
+        query = filter_by_name(db, query, name_substr, by_relevance)
+
+    # stable order, imported employees share their created_on => id breaks the ties (index ix_employees_created_on_id)
+    return query.order_by(models.Employee.created_on, models.Employee.id)
+
+# normalized name filter (None: all the employees) => count
+employees_count_cache = TTLCache(1000, settings.count_cache_ttl)
+
+def estimate_employees_count(db: Session):
+    # planner estimate of the table size (postgres, kept up to date by autovacuum), None if not available
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+
+    estimate = db.execute(text("SELECT reltuples FROM pg_class WHERE oid = 'employees'::regclass")).scalar()
+    return int(estimate) if estimate is not None and estimate >= 0 else None # -1: never analyzed
+
+def count_employees(db: Session, query, name_substr: str, count_mode: enums.CountMode):
+    """
+    returns (count, exact)
+    exact counts are cached count_cache_ttl seconds per filter, estimates are only used for unfiltered
+    listings of more than estimated_count_min_rows employees: above that count(*) scans too much
+    """
+    key = normalize_name(name_substr) if name_substr and name_substr.strip() else None
+
+    if count_mode == enums.CountMode.Estimated and key is None:
+        estimate = estimate_employees_count(db)
+        if estimate is not None and estimate >= settings.estimated_count_min_rows:
+            return (estimate, False)
+
+    count = employees_count_cache.get(key)
+    if count is None:
+        count = query.order_by(None).count()
+        employees_count_cache.set(key, count)
+
+    return (count, True)
+
+def get_employees(db: Session, pagination_param: PagiantionParams, name_substr: str, count_mode: enums.CountMode = enums.CountMode.Exact):
+    query = employees_query(db, name_substr)
     
-    total_records = query.count()
+    total_records, exact = count_employees(db, query, name_substr, count_mode)
     total_pages = div_ceil(total_records, pagination_param.page_size)
     employees = query.limit(pagination_param.page_size).offset((pagination_param.page_number-1)*pagination_param.page_size).all()
-    return (employees, total_records, total_pages)
+    return (employees, total_records, total_pages, exact)
+
+def get_roles_per_employee(db: Session, ids: list[int]):
+    # roles of a whole page in one query instead of one lazy load per employee
+    roles_per_employee = defaultdict(list)
+    for employee_id, role in db.query(models.EmployeeRole.employee_id, models.EmployeeRole.role).filter(models.EmployeeRole.employee_id.in_(ids)):
+        roles_per_employee[employee_id].append(role)
+
+    return roles_per_employee
+
+def iter_employees_batches(db: Session, name_substr: str, batch_size: int):
+    """
+    all the (filtered) employees as (rows, roles per employee) batches for exports
+    server side cursor (yield_per): one batch in memory whatever the table size, one roles query per batch
+    """
+    result = db.execute(employees_query(db, name_substr, by_relevance=False).statement, execution_options={"yield_per": batch_size})
+    for rows in result.partitions():
+        yield rows, get_roles_per_employee(db, [row.id for row in rows])
+
+def encode_cursor(employee):
+    return base64.urlsafe_b64encode(json.dumps([employee.created_on.isoformat(), employee.id]).encode()).decode()
+
+def decode_cursor(cursor: str):
+    # (created_on, id) of the last employee of the previous page, None for an invalid cursor
+    try:
+        created_on, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (datetime.fromisoformat(created_on), int(id))
+    except (ValueError, TypeError):
+        return None
+
+def get_employees_after(db: Session, page_size: int, name_substr: str, after: tuple | None):
+    """
+    keyset pagination: the page starts after the (created_on, id) of the previous one instead of skipping
+    offset rows, so every page costs the same and there is no count. returns (employees, next cursor)
+    """
+    query = employees_query(db, name_substr, by_relevance=False) # the cursor follows (created_on, id)
+    if after:
+        query = query.filter(tuple_(models.Employee.created_on, models.Employee.id) > tuple_(*after))
+
+    employees = query.limit(page_size + 1).all()
+    if len(employees) <= page_size:
+        return (employees, None)
+
+    return (employees[:page_size], encode_cursor(employees[page_size - 1]))
+
+# (field, value) => already in database ? lets resubmitted lines skip the join
+# cleared on every employee write of this process, the ttl covers the other processes
+unique_keys_cache = TTLCache(settings.validation_cache_size, settings.unique_keys_cache_ttl)
+
+def invalidate_employees_caches():
+    # employees changed in this process (called once committed), the ttls cover the other processes
+    unique_keys_cache.clear()
+    name_index.invalidate()
+    employees_count_cache.clear()
+
+# unique columns => temporary staging table, created once per connection and reused by every chunk
+staging_tables = {}
+
+def get_staging_table(unique_columns: dict):
+    key = tuple(unique_columns)
+    if key not in staging_tables:
+        staging_tables[key] = Table(
+            f"import_unique_keys_{'_'.join(key)}", MetaData(),
+            Column("row_index", Integer, nullable=False),
+            Column("to_check", Boolean, nullable=False),
+            *[Column(field, column.type) for field, column in unique_columns.items()],
+            prefixes=["TEMPORARY"],
+            postgresql_on_commit="DELETE ROWS",
+        )
+
+    return staging_tables[key]
+
+def get_duplicated_rows(db: Session, keys: list[dict], unique_columns: dict):
+    """
+    keys: the unique values of each line of the file ({field: value}, None => nothing to check)
+    unique_columns: {field: models.Employee column}
+    the keys are loaded in a temporary staging table joined with employees, so the database
+    returns the offending lines directly: [(row index, field, already in database ?)]
+    in file duplicates (every occurrence after the first one) are found in the same statement
+    lines whose values are all in unique_keys_cache are not joined again
+    """
+    duplicated_rows = []
+    to_check = []
+    for row, row_keys in enumerate(keys):
+        in_db = {field: unique_keys_cache.get((field, value)) for field, value in row_keys.items() if value is not None}
+        to_check.append(None in in_db.values())
+        if not to_check[-1]:
+            duplicated_rows.extend((row, field, True) for field, found in in_db.items() if found)
+
+    staging = get_staging_table(unique_columns)
+    connection = db.connection()
+    # no DDL once the table exists on this connection (a create/drop per chunk bloats the postgres catalog)
+    # created again if the transaction that created it was rolled back
+    staging.create(connection, checkfirst=True)
+
+    copy_rows(db, staging, [{"row_index": row, "to_check": to_check[row], **row_keys} for row, row_keys in enumerate(keys)])
+
+    queries = []
+    for field, column in unique_columns.items():
+        key = staging.c[field]
+        occurrence = func.row_number().over(partition_by=key, order_by=staging.c.row_index).label("occurrence")
+        ranked = select(staging.c.row_index, occurrence).where(key.is_not(None)).subquery()
+
+        queries.append(select(ranked.c.row_index, literal(field).label("field"), literal(False).label("in_db")).where(ranked.c.occurrence > 1))
+        queries.append(select(staging.c.row_index, literal(field), literal(True)).join_from(staging, models.Employee, column == key).where(staging.c.to_check))
+
+    found = {tuple(duplicated_row) for duplicated_row in connection.execute(union_all(*queries)).all()}
+    # emptied for a next call in the same transaction, not in a finally: an error aborts the transaction
+    # (nothing can run on it) and its rollback discards these rows anyway
+    connection.execute(staging.delete())
+
+    for row, row_keys in enumerate(keys):
+        if to_check[row]:
+            for field, value in row_keys.items():
+                if value is not None:
+                    unique_keys_cache.set((field, value), (row, field, True) in found)
+
+    return duplicated_rows + list(found)
+
+def add_imported_employees(db: Session, employees_data: list[dict], roles_per_email: dict):
+    """
+    add the employees of an import with their roles and activation codes, returns {email: signed activation code}
+    small batches go through the orm, big ones are written set-wise: multi-row
+    INSERT ... RETURNING for the employees and the activation codes (the returned ids are mapped by email)
+    then the roles are COPYed
+    """
+    on_commit(db, invalidate_employees_caches)
+    bump_table_version(db, EMPLOYEES)
+
+    if len(employees_data) < settings.bulk_insert_min_rows:
+        # exercice: add
+        # add_all vs nektbou l query wahadna w laken rod belek w hawel esta3mel l orm le max
+        # n7ebou naarfou role kol user  baed maysirlou add
+        employees_to_add = [models.Employee(**emp) for emp in employees_data]
+        db.add_all(employees_to_add)
+        db.flush() # field id fih value, email mawjoud
+        #case 1: imagine employees lost their order
+        db.add_all([models.EmployeeRole(employee_id=emp.id, role=role) for emp in employees_to_add for role in roles_per_email[emp.email]])
+        activation_codes = [models.AccountActivation(employee_id=emp.id, email=emp.email, status=enums.TokenStatus.Pending) for emp in employees_to_add]
+        db.add_all(activation_codes)
+        db.flush()
+
+        return {code.email: sign_code(ACTIVATION_CODE, code.id) for code in activation_codes}
+
+    employees_table = models.Employee.__table__
+    ids_per_email = dict(db.execute(
+        insert(employees_table).returning(employees_table.c.email, employees_table.c.id),
+        [{**emp, 'password': str(emp['password'])} for emp in employees_data],
+    ).all())
+
+    copy_rows(db, models.EmployeeRole.__table__, [
+        {'employee_id': ids_per_email[email], 'role': role}
+        for email, roles in roles_per_email.items() for role in roles
+    ])
+    # not COPYed: the codes carry the ids of the rows
+    activation_table = models.AccountActivation.__table__
+    code_ids_per_email = dict(db.execute(
+        insert(activation_table).returning(activation_table.c.email, activation_table.c.id),
+        [{'employee_id': employee_id, 'email': email, 'status': enums.TokenStatus.Pending} for email, employee_id in ids_per_email.items()],
+    ).all())
+
+    return {email: sign_code(ACTIVATION_CODE, id) for email, id in code_ids_per_email.items()}
 
-async def add_employee(db: Session, employee: schemas.EmployeeCreate):
-    employee.password = get_password_hash(employee.password)
+async def add_employee(db: AsyncSession, employee: schemas.EmployeeCreate):
+    employee.password = await get_password_hash(employee.password)
     employee_data = employee.model_dump()
     employee_data.pop('confirm_password')
     roles = employee_data.pop('roles')
     # add employee
+    on_commit(db, invalidate_employees_caches)
     db_employee = models.Employee(**employee_data)
     db.add(db_employee) 
-    db.flush()
+    await db.flush()
     # add employee roles
     db.add_all([models.EmployeeRole(role=role, employee_id=db_employee.id) for role in roles])
     #add confirmation code 
-    activation_code = add_confirmation_code(db, db_employee.id, db_employee.email)
+    activation_code = await add_confirmation_code(db, db_employee.id, db_employee.email)
     
-    # send confirmation email
-    await emailService.simple_send([db_employee.email], {
+    # confirmation email, sent by the outbox once committed
+    add_outbox_email(db, [db_employee.email], {
             'name': db_employee.first_name,
-            'code': activation_code.token,
+            'code': sign_code(ACTIVATION_CODE, activation_code.id),
             'psw': employee.password,
         }, enums.EmailTemplate.ConfirmAccount,
     )
-    db.commit()
+    # last: the version row stays locked until the commit
+    await bump_table_version_async(db, EMPLOYEES)
+    await db.commit()
     return db_employee
 
-async def edit_employee(db: Session, id: int, entry: schemas.EmployeeEdit):
-    query = db.query(models.Employee).filter(models.Employee.id == id)
-    employee_in_db = query.first()
+async def edit_employee(db: AsyncSession, id: int, entry: schemas.EmployeeEdit):
+    employee_in_db = await db.get(models.Employee, id)
 
     if not employee_in_db:
         raise HTTPException(status_code=400, detail="Employee not found")
@@ -84,35 +299,39 @@ async def edit_employee(db: Session, id: int, entry: schemas.EmployeeEdit):
 
     # if edited email
     if employee_in_db.email != entry.email:
-        if not entry.actual_password or get_password_hash(entry.password) != employee_in_db.password:
+        if not entry.actual_password or not await verify_password(entry.actual_password, employee_in_db.password):
             raise HTTPException(status_code=400, detail="Current Password missing or incorrect. It's mandatory to set a new email")
         
         fields_to_update[models.Employee.email] = entry.email
         fields_to_update[models.Employee.account_status] = enums.AccountStatus.Inactive
 
     # if edited psw
-    if entry.password and get_password_hash(entry.password) != employee_in_db.password:
+    if entry.password and not await verify_password(entry.password, employee_in_db.password):
         if entry.password != entry.confirm_password:
             raise HTTPException(status_code=400, detail="Passwords must match")
         
-        if not entry.actual_password or get_password_hash(entry.actual_password) != employee_in_db.password:
+        if not entry.actual_password or not await verify_password(entry.actual_password, employee_in_db.password):
             raise HTTPException(status_code=400, detail="Current Password missing or incorrect. It's mandatory to set a new password")
         
-        fields_to_update[models.Employee.password] = get_password_hash(entry.password)
+        fields_to_update[models.Employee.password] = await get_password_hash(entry.password)
 
-    query.update(fields_to_update, synchronize_session=False)
+    await db.execute(update(models.Employee).where(models.Employee.id == id).values(fields_to_update).execution_options(synchronize_session=False))
+    email = employee_in_db.email
+    on_commit(db, lambda: invalidate_principal(email))
+    on_commit(db, invalidate_employees_caches)
 
     if models.Employee.email in fields_to_update:
-        activation_code = add_confirmation_code(db, employee_in_db.id, fields_to_update[models.Employee.email])
+        activation_code = await add_confirmation_code(db, employee_in_db.id, fields_to_update[models.Employee.email])
     
-        # send confirmation email
-        await emailService.simple_send([employee_in_db.email], {
+        # confirmation email, sent by the outbox once committed
+        add_outbox_email(db, [employee_in_db.email], {
                 'name': employee_in_db.first_name,
-                'code': activation_code.token,
+                'code': sign_code(ACTIVATION_CODE, activation_code.id),
             }, enums.EmailTemplate.ConfirmAccount,
         )
     
-    db.commit()
+    await bump_table_version_async(db, EMPLOYEES)
+    await db.commit()
 
 
 
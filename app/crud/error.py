@@ -1,5 +1,6 @@
 from fastapi import HTTPException
 from app import models
+from app.database import SessionLocal
 
 def get_error_message(error_message, error_keys):
     for error_key in error_keys:
@@ -16,4 +17,21 @@ def add_error(text, db):
         db.commit()
     except Exception as e:
         # alternative solutions bech ken db tahet najem nal9a l mochkla
-        raise HTTPException(status_code=500, detail="Something went wrong") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Something went wrong") 
+
+def add_error_on_primary(text):
+    # for the read only routes: their session may be on the replica, where the error can't be written
+    db = SessionLocal()
+    try:
+        add_error(text, db)
+    finally:
+        db.close()
+
+async def add_error_async(text, db):
+    try:
+        db.add(models.Error(
+            text=text,
+        ))
+        await db.commit()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Something went wrong")
@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from app import models, enums
+from app.config import settings
+
+unfinished_job_statuses = [enums.JobStatus.Pending, enums.JobStatus.Running]
+
+
+def get_import_job(db: Session, id: int):
+    return db.query(models.ImportJob).filter(models.ImportJob.id == id).first()
+
+def add_import_job(db: Session, total_lines: int, owner: str):
+    job = models.ImportJob(status=enums.JobStatus.Pending, total_lines=total_lines, processed_lines=0, added_lines=0, owner=owner)
+    db.add(job)
+
+    return job
+
+def edit_import_job(db: Session, id: int, new_data: dict):
+    db.query(models.ImportJob).filter(models.ImportJob.id == id).update(new_data, synchronize_session=False)
+
+def touch_import_jobs(db: Session, owner: str):
+    # heartbeat of the unfinished jobs of a worker, db clock: the workers may run on several hosts
+    db.query(models.ImportJob).filter(models.ImportJob.owner == owner, models.ImportJob.status.in_(unfinished_job_statuses)).update({
+        models.ImportJob.heartbeat_on: func.now(),
+    }, synchronize_session=False)
+    db.commit()
+
+# jobs live in the memory of the worker that accepted them, the ones of a dead worker will never end
+# a job is failed once its heartbeat is stale, or right away when its owner is a dead process of this host
+def fail_interrupted_import_jobs(db: Session, is_owner_alive):
+    unfinished = db.query(models.ImportJob.owner).filter(models.ImportJob.status.in_(unfinished_job_statuses)).distinct().all()
+    dead_owners = [owner for owner, in unfinished if owner is not None and not is_owner_alive(owner)]
+
+    db.query(models.ImportJob).filter(
+        models.ImportJob.status.in_(unfinished_job_statuses),
+        or_(
+            models.ImportJob.heartbeat_on < func.now() - timedelta(seconds=settings.import_heartbeat_timeout),
+            models.ImportJob.owner.in_(dead_owners),
+            models.ImportJob.owner.is_(None),
+        ),
+    ).update({
+        models.ImportJob.status: enums.JobStatus.Failed,
+        models.ImportJob.finished_on: datetime.now(),
+    }, synchronize_session=False)
+    db.commit()
+
+def get_import_report(db: Session, id: int):
+    return db.query(models.ImportReport).filter(models.ImportReport.id == id).first()
+
+def add_import_report(db: Session, error_count: int, warning_count: int, wrong_cell_count: int, issues: list):
+    report = models.ImportReport(error_count=error_count, warning_count=warning_count, wrong_cell_count=wrong_cell_count, issues=issues)
+    db.add(report)
+    db.flush()
+
+    return report
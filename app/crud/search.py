@@ -0,0 +1,100 @@
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Query, Session
+
+from app import models
+from app.config import settings
+
+
+def normalize_name(text: str):
+    # same form as the generated column employees.full_name
+    return (' ').join(text.lower().split())
+
+def like_escape(text: str):
+    return re.sub(r'([\\%_])', r'\\\1', text)
+
+def trigrams(text: str):
+    # like pg_trgm: each word padded with two spaces before and one after
+    result = set()
+    for word in re.findall(r'\w+', text.lower()):
+        padded = f"  {word} "
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+class NameIndex:
+    """
+    in memory trigram index of the employees full names, replaces pg_trgm on the other databases (tests)
+    built on the first search, rebuilt on the next one after an employee write of this process (once committed)
+    or once older than ttl (writes of the other processes)
+    """
+    min_score = 0.6 # share of the searched trigrams found in the name, like pg_trgm.word_similarity_threshold
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._names = None # id => full name
+        self._ids_per_trigram = {}
+        self._built_on = 0.0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        self._names = None
+
+    def _build(self, db: Session):
+        names = dict(db.query(models.Employee.id, models.Employee.full_name).all())
+        ids_per_trigram = defaultdict(set)
+        for id, name in names.items():
+            for trigram in trigrams(name):
+                ids_per_trigram[trigram].add(id)
+
+        self._ids_per_trigram = ids_per_trigram
+        self._names = names
+        self._built_on = time.monotonic()
+
+    def search(self, db: Session, text: str):
+        # ids of the employees whose name contains text or is close to it, most relevant first
+        with self._lock:
+            if self._names is None or time.monotonic() - self._built_on > self.ttl:
+                self._build(db)
+            names, ids_per_trigram = self._names, self._ids_per_trigram
+
+        searched_trigrams = trigrams(text)
+        common_trigrams = Counter()
+        for trigram in searched_trigrams:
+            common_trigrams.update(ids_per_trigram.get(trigram, ()))
+
+        matches = []
+        for id, name in names.items():
+            score = common_trigrams[id] / len(searched_trigrams) if searched_trigrams else 0
+            if text in name or score >= self.min_score:
+                matches.append((not name.startswith(text), -score, id))
+
+        return [id for _, _, id in sorted(matches)]
+
+name_index = NameIndex(settings.name_index_ttl)
+
+def filter_by_name(db: Session, query: Query, name_substr: str, by_relevance: bool):
+    """
+    employees whose full name contains name_substr (index backed LIKE '%x%') or is close to it (typos, word similarity)
+    by_relevance => names starting with it first then the most similar ones
+    """
+    text = normalize_name(name_substr)
+    full_name = models.Employee.full_name
+
+    if db.get_bind().dialect.name != "postgresql":
+        ids = name_index.search(db, text)
+        query = query.filter(models.Employee.id.in_(ids))
+        if by_relevance and ids:
+            query = query.order_by(case({id: position for position, id in enumerate(ids)}, value=models.Employee.id))
+        return query
+
+    escaped = like_escape(text)
+    # full_name %> text: word_similarity(text, full_name) over the threshold, both operators use ix_employees_full_name_trgm
+    query = query.filter(full_name.like(f"%{escaped}%") | full_name.op('%>')(text))
+    if by_relevance:
+        query = query.order_by(full_name.like(f"{escaped}%").desc(), func.word_similarity(text, full_name).desc())
+
+    return query
@@ -0,0 +1,39 @@
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app import models
+from app.cache import TTLCache
+from app.config import settings
+
+EMPLOYEES = "employees" # employees and their roles
+
+# table => (version, updated_on), read from the database at most every table_version_ttl seconds
+table_versions_cache = TTLCache(100, settings.table_version_ttl)
+
+def table_version_bump(db: Session | AsyncSession, name: str):
+    # upsert: a database made by create_all (not by the migrations) has no row yet, an update alone would keep (0, None)
+    insert = (postgresql if db.get_bind().dialect.name == "postgresql" else sqlite).insert
+    statement = insert(models.TableVersion).values(name=name, version=1, updated_on=func.now())
+    return statement.on_conflict_do_update(
+        index_elements=[models.TableVersion.name],
+        set_={"version": models.TableVersion.version + 1, "updated_on": func.now()},
+    )
+
+# bumped in the transaction of the write: readers never see new data with an old version
+def bump_table_version(db: Session, name: str):
+    db.execute(table_version_bump(db, name))
+    table_versions_cache.pop(name)
+
+async def bump_table_version_async(db: AsyncSession, name: str):
+    await db.execute(table_version_bump(db, name))
+    table_versions_cache.pop(name)
+
+def get_table_version(db: Session, name: str):
+    version = table_versions_cache.get(name)
+    if version is None:
+        row = db.execute(select(models.TableVersion.version, models.TableVersion.updated_on).where(models.TableVersion.name == name)).first()
+        version = tuple(row) if row else (0, None)
+        table_versions_cache.set(name, version)
+
+    return version
@@ -1,21 +1,158 @@
-from sqlalchemy import create_engine
+import time
+from fastapi import Request
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.datastructures import MutableHeaders
 from .config import settings
 
 SQLALCHEMY_DATABASE_URL = f'postgresql://{settings.database_username}:{settings.database_password}@{settings.database_hostname}:{settings.database_port}/{settings.database_name}'
+ASYNC_SQLALCHEMY_DATABASE_URL = f'postgresql+asyncpg://{settings.database_username}:{settings.database_password}@{settings.database_hostname}:{settings.database_port}/{settings.database_name}'
+REPLICA_SQLALCHEMY_DATABASE_URL = f'postgresql://{settings.database_username}:{settings.database_password}@{settings.database_replica_hostname}:{settings.database_replica_port or settings.database_port}/{settings.database_name}'
 
+# engine name => checkout counters, an undersized pool shows up as waits then timeouts
+pool_metrics = {}
+
+def instrumented_pool(pool_class, name: str):
+    metrics = pool_metrics[name] = {"checkouts": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0, "timeouts": 0}
+
+    class InstrumentedPool(pool_class):
+        def _do_get(self):
+            started_on = time.perf_counter()
+            try:
+                return super()._do_get()
+            except exc.TimeoutError:
+                metrics["timeouts"] += 1
+                raise
+            finally:
+                wait = time.perf_counter() - started_on
+                metrics["checkouts"] += 1
+                metrics["wait_seconds"] += wait
+                metrics["max_wait_seconds"] = max(metrics["max_wait_seconds"], wait)
+
+    return InstrumentedPool
+
+pool_options = {
+    "pool_size": settings.db_pool_size,
+    "max_overflow": settings.db_max_overflow,
+    "pool_timeout": settings.db_pool_timeout,
+    "pool_recycle": settings.db_pool_recycle,
+    "pool_pre_ping": settings.db_pool_pre_ping,
+}
+statement_timeout_args = {"options": f"-c statement_timeout={settings.db_statement_timeout}"} if settings.db_statement_timeout else {}
+
+# sync engine: def endpoints (run in the threadpool), import jobs, background tasks and alembic
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
     echo=False, # True to see queries
+    poolclass=instrumented_pool(QueuePool, "primary"),
+    connect_args=statement_timeout_args,
+    **pool_options,
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# async engine: async def endpoints, waiting for the database no longer blocks the event loop
+async_engine = create_async_engine(
+    ASYNC_SQLALCHEMY_DATABASE_URL,
+    echo=False,
+    poolclass=instrumented_pool(AsyncAdaptedQueuePool, "async"),
+    connect_args={"server_settings": {"statement_timeout": str(settings.db_statement_timeout)}} if settings.db_statement_timeout else {},
+    **pool_options,
+)
+# no lazy loading on async sessions: load relationships in the query (selectinload) and keep objects usable after commit
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# read only routes (ReadDbDep) use the replica when there is one, the primary otherwise
+replica_engine = create_engine(
+    REPLICA_SQLALCHEMY_DATABASE_URL,
+    echo=False,
+    poolclass=instrumented_pool(QueuePool, "replica"),
+    connect_args=statement_timeout_args,
+    **pool_options,
+) if settings.database_replica_hostname else None
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine or engine)
+
+# time of the last write of the client, carried by the client (cookie, or header for api clients) and not kept
+# in a worker memory: its reads go to the primary whatever worker serves them, the replica may not have the write yet
+LAST_WRITE_COOKIE = "last_write"
+LAST_WRITE_HEADER = "x-last-write"
+
 Base = declarative_base()
 
+def on_commit(db, callback):
+    # runs callback once the transaction of db (sync or async session) commits, forgotten on rollback
+    # caches invalidated before the commit would be refilled from the old rows by a concurrent read
+    session = getattr(db, "sync_session", db)
+    session.info.setdefault("on_commit", []).append(callback)
+
+@event.listens_for(Session, "after_commit")
+def run_on_commit(session: Session):
+    for callback in session.info.pop("on_commit", []):
+        callback()
+
+@event.listens_for(Session, "after_rollback")
+def forget_on_commit(session: Session):
+    session.info.pop("on_commit", None)
+
+def get_pool_metrics():
+    engines = {"primary": engine, "async": async_engine, "replica": replica_engine}
+    return {
+        name: {**metrics, "size": engines[name].pool.size(), "checked_out": engines[name].pool.checkedout(), "overflow": engines[name].pool.overflow()}
+        for name, metrics in pool_metrics.items() if engines.get(name) is not None
+    }
+
+class LastWriteMiddleware:
+    """
+    stamps the responses of the writes (non GET requests) with the last_write cookie and header
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or replica_engine is None or scope["method"] in ("GET", "HEAD", "OPTIONS"):
+            return await self.app(scope, receive, send)
+
+        async def send_with_last_write(message):
+            if message["type"] == "http.response.start":
+                # the response starts after the handler committed => the window covers the replication lag
+                last_write = f"{time.time():.3f}"
+                headers = MutableHeaders(scope=message)
+                headers.append("set-cookie", f"{LAST_WRITE_COOKIE}={last_write}; Max-Age={settings.replica_lag_window}; Path=/; HttpOnly; SameSite=lax")
+                headers.append(LAST_WRITE_HEADER, last_write)
+            await send(message)
+
+        await self.app(scope, receive, send_with_last_write)
+
+def wrote_recently(request: Request):
+    last_write = request.cookies.get(LAST_WRITE_COOKIE) or request.headers.get(LAST_WRITE_HEADER)
+    try:
+        # abs: a little clock skew between the workers (or a forged future value) doesn't pin the client to the primary
+        return abs(time.time() - float(last_write)) < settings.replica_lag_window
+    except (TypeError, ValueError):
+        return False
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def read_session_factory(request: Request):
+    if replica_engine is not None and wrote_recently(request):
+        return SessionLocal
+
+    return ReadSessionLocal
+
+def get_read_db(request: Request):
+    db = read_session_factory(request)()
+    try:
+        yield db
+    finally:
+        db.close()
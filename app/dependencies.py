@@ -3,11 +3,17 @@ from fastapi import Depends
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 
 from app.OAuth2 import get_curr_employee
-from .database import get_db
+from .database import get_async_db, get_db, get_read_db
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session  
 
 DbDep = Annotated[Session, Depends(get_db)]
 
+AsyncDbDep = Annotated[AsyncSession, Depends(get_async_db)]
+
+# read only routes, served by the replica when there is one
+ReadDbDep = Annotated[Session, Depends(get_read_db)]
+
 class PagiantionParams:
     def __init__(self, page_size: int = 10, page_number: int = 1):
         self.page_size = page_size
@@ -7,4 +7,8 @@ from .matchyComparer import Comparer
 from .matchyConditionProperty import ConditionProperty
 from .matchyFieldType import FieldType
 from .emailTemplate import EmailTemplate
+from .jobStatus import JobStatus
+from .countMode import CountMode
+from .exportFormat import ExportFormat
+from .emailStatus import EmailStatus
 from .basicEnum import BasicEnum
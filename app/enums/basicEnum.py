@@ -1,5 +1,8 @@
 from enum import Enum
 
+# enum class => {VALUE: member}, built on first use
+_values_lookups = {}
+
 class BasicEnum(str, Enum):
     @classmethod
     def getPossibleValues(cls):
@@ -7,9 +10,8 @@ class BasicEnum(str, Enum):
     
     @classmethod
     def is_valid_enum_value(cls, field):
-        for val in cls:
-            if field.strip().upper() == val.value.upper():
-                return val
-            
-        return None
+        if cls not in _values_lookups:
+            _values_lookups[cls] = {val.value.upper(): val for val in cls}
+
+        return _values_lookups[cls].get(field.strip().upper())
     
\ No newline at end of file
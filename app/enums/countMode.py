@@ -0,0 +1,6 @@
+from .basicEnum import BasicEnum
+
+
+class CountMode(BasicEnum):
+    Exact = "Exact" # count(*) of the filtered employees, cached a few seconds
+    Estimated = "Estimated" # planner estimate for big unfiltered listings, exact otherwise
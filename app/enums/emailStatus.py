@@ -0,0 +1,7 @@
+from .basicEnum import BasicEnum
+
+
+class EmailStatus(BasicEnum):
+    Pending = "Pending" # waiting for the sender (first attempt or retry)
+    Sent = "Sent"
+    Dead = "Dead" # outbox_max_attempts failed, only sent again by /emails/{id}/resend
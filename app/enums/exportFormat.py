@@ -0,0 +1,6 @@
+from .basicEnum import BasicEnum
+
+
+class ExportFormat(BasicEnum):
+    Csv = "csv" # header + one line per employee, roles comma separated
+    Ndjson = "ndjson" # one EmployeeOut json per line
@@ -0,0 +1,8 @@
+from .basicEnum import BasicEnum
+
+
+class JobStatus(BasicEnum):
+    Pending = "Pending" # submitted, waiting for a free worker
+    Running = "Running"
+    Done = "Done"
+    Failed = "Failed"
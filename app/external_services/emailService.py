@@ -1,10 +1,13 @@
+import asyncio
+import time
+from email.mime.text import MIMEText
+from email.utils import formataddr, formatdate, make_msgid
 from pathlib import Path
-from typing import List
 
-from fastapi import BackgroundTasks, FastAPI
-from fastapi_mail import ConnectionConfig, FastMail, MessageSchema, MessageType
-from pydantic import BaseModel, EmailStr
-from starlette.responses import JSONResponse
+import aiosmtplib
+from fastapi_mail import ConnectionConfig
+from jinja2 import Environment, FileSystemLoader
+from pydantic import EmailStr
 
 from app.enums.emailTemplate import EmailTemplate
 from ..config import settings
@@ -13,12 +16,12 @@ conf = ConnectionConfig(
     MAIL_USERNAME = settings.mail_username,
     MAIL_PASSWORD = settings.mail_password,
     MAIL_FROM = settings.mail_from,
-    MAIL_PORT = 465,
+    MAIL_PORT = settings.mail_port,
     MAIL_SERVER = settings.mail_server,
-    MAIL_STARTTLS = False,
-    MAIL_SSL_TLS = True,
-    USE_CREDENTIALS = True,
-    VALIDATE_CERTS = True,
+    MAIL_STARTTLS = settings.mail_starttls,
+    MAIL_SSL_TLS = settings.mail_ssl_tls,
+    USE_CREDENTIALS = settings.mail_use_credentials,
+    VALIDATE_CERTS = settings.mail_validate_certs,
     TEMPLATE_FOLDER = Path(__file__).parent / 'templates',
 )
 
@@ -27,14 +30,178 @@ template_name_per_template = {
     EmailTemplate.ResetPassword: "reset_pass_mail.html"
 }
 
-async def simple_send(emails: list[EmailStr], body: dict, template: EmailTemplate):
+# templates are read and compiled once (jinja caches them), no stat of the file per message
+templates_env = Environment(loader=FileSystemLoader(conf.TEMPLATE_FOLDER), auto_reload=False)
 
-    message = MessageSchema(
-        subject="Fastapi-Mail module",
-        recipients=emails,
-        template_body=body,
-        subtype=MessageType.html)
+def build_message(emails: list[EmailStr], body: dict, template: EmailTemplate):
+    # compat32 MIMEText like fastapi-mail: the EmailMessage header registry costs ~2ms per message
+    message = MIMEText(templates_env.get_template(template_name_per_template[template]).render(**body), "html", "utf-8")
+    message["Subject"] = "Fastapi-Mail module"
+    message["From"] = formataddr((conf.MAIL_FROM_NAME, conf.MAIL_FROM)) if conf.MAIL_FROM_NAME else conf.MAIL_FROM
+    message["To"] = ", ".join(emails)
+    message["Date"] = formatdate(localtime=True)
+    message["Message-ID"] = make_msgid()
+    return message
 
-    fm = FastMail(conf)
-    await fm.send_message(message, template_name=template_name_per_template[template])
-    return JSONResponse(status_code=200, content={"message": "email has been sent"})     
\ No newline at end of file
+
+class PooledConnection:
+    def __init__(self, smtp: aiosmtplib.SMTP):
+        self.smtp = smtp
+        self.messages = 0
+        self.idle_since = time.monotonic()
+
+
+class SMTPPool:
+    """
+    authenticated smtp connections reused from a message to the next: one handshake and login per connection instead of per message
+    """
+    def __init__(self, size: int, max_messages: int, idle_timeout: int):
+        self.size = size
+        self.max_messages = max_messages
+        self.idle_timeout = idle_timeout
+        self.loop = None
+        self.slots = None
+        self.idle: list[PooledConnection] = []
+        self.metrics = {"connections": 0, "messages": 0, "failures": 0, "send_seconds": 0.0}
+
+    def bind_loop(self):
+        # connections (and the semaphore) belong to the loop that made them, another loop (asyncio.run) starts a new pool
+        loop = asyncio.get_running_loop()
+        if loop is not self.loop:
+            self.loop, self.slots, self.idle = loop, asyncio.Semaphore(self.size), []
+
+    async def connect(self):
+        smtp = aiosmtplib.SMTP(
+            hostname=conf.MAIL_SERVER,
+            port=conf.MAIL_PORT,
+            timeout=conf.TIMEOUT,
+            use_tls=conf.MAIL_SSL_TLS,
+            start_tls=conf.MAIL_STARTTLS,
+            validate_certs=conf.VALIDATE_CERTS,
+        )
+        await smtp.connect()
+        if conf.USE_CREDENTIALS:
+            try:
+                await smtp.login(conf.MAIL_USERNAME, conf.MAIL_PASSWORD)
+            except Exception:
+                smtp.close()
+                raise
+
+        self.metrics["connections"] += 1
+        return PooledConnection(smtp)
+
+    async def close(self, connection: PooledConnection):
+        try:
+            await connection.smtp.quit()
+        except Exception:
+            connection.smtp.close()
+
+    async def acquire(self):
+        while self.idle:
+            connection = self.idle.pop()
+            if time.monotonic() - connection.idle_since < self.idle_timeout and connection.smtp.is_connected:
+                return connection
+            await self.close(connection)
+
+        return await self.connect()
+
+    def release(self, connection: PooledConnection):
+        connection.idle_since = time.monotonic()
+        self.idle.append(connection)
+
+    async def send_one(self, connection: PooledConnection | None, message: MIMEText):
+        # returns the connection to go on with (None: closed) and the error of the message (None: sent)
+        # raises when no connection can be made (server unreachable, login refused)
+        for retry in (False, True):
+            if connection is None:
+                connection = await self.acquire()
+            try:
+                await connection.smtp.send_message(message)
+            except (aiosmtplib.SMTPServerDisconnected, ConnectionError, OSError) as e:
+                # the server dropped the connection (idle, restarted): retried once on a new one
+                connection.smtp.close()
+                connection = None
+                if retry:
+                    return None, str(e) or type(e).__name__
+            except aiosmtplib.SMTPException as e:
+                # message refused (recipient, quota...): the session stays usable for the next one
+                return connection, str(e) or type(e).__name__
+            else:
+                connection.messages += 1
+                if connection.messages >= self.max_messages:
+                    await self.close(connection)
+                    connection = None
+                return connection, None
+
+    async def send(self, messages: list[MIMEText]):
+        """
+        sends the messages over at most size connections in parallel, each connection sending its share one after the other
+        returns the error of every message, None when sent
+        """
+        self.bind_loop()
+        errors: list[str | None] = [None] * len(messages)
+        pending = iter(range(len(messages))) # shared by the senders, next() never awaits
+        unreachable = None
+        started = time.monotonic()
+
+        async def sender():
+            nonlocal unreachable
+            async with self.slots:
+                connection = None
+                try:
+                    for i in pending:
+                        if unreachable and connection is None:
+                            # no new connection for the rest of the batch: each try could wait conf.TIMEOUT,
+                            # the batch would outlast its outbox lease and be claimed again by another worker
+                            errors[i] = unreachable
+                            continue
+                        try:
+                            connection, errors[i] = await self.send_one(connection, messages[i])
+                        except Exception as e:
+                            connection = None
+                            unreachable = errors[i] = f"smtp server unreachable: {str(e) or type(e).__name__}"
+                finally:
+                    if connection is not None:
+                        self.release(connection)
+
+        await asyncio.gather(*(sender() for _ in range(min(self.size, len(messages)))))
+
+        failures = sum(error is not None for error in errors)
+        self.metrics["messages"] += len(messages) - failures
+        self.metrics["failures"] += failures
+        self.metrics["send_seconds"] += time.monotonic() - started
+        return errors
+
+    async def close_all(self):
+        idle, self.idle = self.idle, []
+        for connection in idle:
+            await self.close(connection)
+
+smtp_pool = SMTPPool(settings.mail_pool_size, settings.mail_connection_max_messages, settings.mail_connection_idle_timeout)
+
+def get_email_metrics():
+    return {
+        **smtp_pool.metrics,
+        "messages_per_second": round(smtp_pool.metrics["messages"] / smtp_pool.metrics["send_seconds"], 1) if smtp_pool.metrics["send_seconds"] else None,
+        "idle_connections": len(smtp_pool.idle),
+        "pool_size": smtp_pool.size,
+    }
+
+async def send_batch(emails: list[tuple[list[EmailStr], dict, EmailTemplate]]):
+    """
+    sends (recipients, body, template) emails over the pooled connections, returns the error of every email, None when sent
+    """
+    errors: list[str | None] = [None] * len(emails)
+    messages = []
+    for i, (recipients, body, template) in enumerate(emails):
+        try:
+            messages.append((i, build_message(recipients, body, template)))
+        except Exception as e:
+            errors[i] = f"template: {e}"
+
+    if conf.SUPPRESS_SEND:
+        return errors
+
+    for (i, _), error in zip(messages, await smtp_pool.send([message for _, message in messages])):
+        errors[i] = error
+    return errors
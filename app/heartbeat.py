@@ -0,0 +1,28 @@
+import asyncio
+import logging
+
+from app.config import settings
+from app.crud.job import fail_interrupted_import_jobs, touch_import_jobs
+from app.database import SessionLocal
+from app.workers import get_worker_id, is_worker_alive
+
+logger = logging.getLogger(__name__)
+
+
+def beat():
+    db = SessionLocal()
+    try:
+        touch_import_jobs(db, get_worker_id())
+        fail_interrupted_import_jobs(db, is_worker_alive)
+    finally:
+        db.close()
+
+async def run_import_heartbeat():
+    # started by the app lifespan: keeps the jobs of this worker alive and fails the ones of the dead workers
+    while True:
+        try:
+            await asyncio.to_thread(beat)
+        except Exception:
+            logger.exception("import heartbeat failed")
+
+        await asyncio.sleep(settings.import_heartbeat_interval)
@@ -0,0 +1,49 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+
+def validator_headers(etag: str, last_modified: datetime | None, cache_control: str):
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified:
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+
+    return headers
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime | None = None):
+    # If-None-Match wins over If-Modified-Since (rfc 9110), etags are compared weakly
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return if_none_match.strip() == "*" or etag.removeprefix("W/") in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        return last_modified.replace(microsecond=0) <= since
+
+    return False
+
+class PreparedJson:
+    """
+    static payload serialized once, served as bytes with a content etag (or as a 304)
+    """
+    def __init__(self, content: BaseModel, cache_control: str = "public, max-age=3600"):
+        self.body = content.model_dump_json().encode()
+        self.headers = validator_headers(f'"{hashlib.sha1(self.body).hexdigest()[:20]}"', None, cache_control)
+
+    def response(self, request: Request):
+        if is_not_modified(request, self.headers["ETag"]):
+            return Response(status_code=304, headers=self.headers)
+
+        return Response(self.body, media_type="application/json", headers=self.headers)
@@ -0,0 +1,82 @@
+import math
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+from fastapi import HTTPException, Request, status
+
+from .config import settings
+
+
+class MemoryRateLimitStore:
+    """
+    sliding window log per key, in the process memory => with several workers each one applies the limits
+    any object with the same hit method (ex: redis sorted sets) can replace it as rate_limit_store
+    to share the limits between workers and servers
+    """
+    sweep_interval = 60 # seconds between two removals of the idle keys
+
+    def __init__(self):
+        self._hits = {} # key => deque of the hits timestamps in the window, oldest first
+        self._windows = {} # key => window
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + self.sweep_interval
+
+    def hit(self, key: str, limit: int, window: float):
+        # records a hit, returns 0 if allowed else the seconds to wait before the next allowed hit
+        now = time.monotonic()
+        with self._lock:
+            hits = self._hits.get(key)
+            if hits is None:
+                hits = self._hits[key] = deque()
+                self._windows[key] = window
+
+            while hits and hits[0] <= now - window:
+                hits.popleft()
+            if len(hits) >= limit:
+                return hits[0] + window - now
+
+            hits.append(now)
+            if now >= self._next_sweep:
+                self._sweep(now)
+            return 0
+
+    def _sweep(self, now: float):
+        for key in [key for key, hits in self._hits.items() if not hits or hits[-1] <= now - self._windows[key]]:
+            del self._hits[key]
+            del self._windows[key]
+        self._next_sweep = now + self.sweep_interval
+
+    def __len__(self):
+        return len(self._hits)
+
+rate_limit_store = MemoryRateLimitStore()
+
+@lru_cache
+def parse_rule(rule: str):
+    # "5/60" => 5 hits per 60 seconds
+    limit, window = rule.split('/')
+    return int(limit), float(window)
+
+def limit_rate(route: str, request: Request, account: str | None = None):
+    """
+    raises a 429 (with Retry-After) once the client ip or the account went over the limits of the route
+    (settings.rate_limits_per_ip and settings.rate_limits_per_account, routes without rule are not limited)
+    """
+    checks = (
+        ("ip", request.client.host if request.client else None, settings.rate_limits_per_ip.get(route)),
+        ("account", account.lower() if account else None, settings.rate_limits_per_account.get(route)),
+    )
+    for scope, identity, rule in checks:
+        if identity is None or not rule:
+            continue
+
+        limit, window = parse_rule(rule)
+        retry_after = rate_limit_store.hit(f"{route}:{scope}:{identity}", limit, window)
+        if retry_after > 0:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests, try again later",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
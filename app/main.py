@@ -1,12 +1,41 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from .routers import employee, auth
+from .database import LastWriteMiddleware
+from .external_services.emailService import smtp_pool
+from .heartbeat import run_import_heartbeat
+from .outbox import run_outbox
+from .retention import run_retention
+from .routers import employee, auth, metrics, email
+from .workers import hashing_executor, import_executor, shutdown_validation_executor, start_validation_executor
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # first: forks the validation processes before the tasks below start threads
+    start_validation_executor()
+    # first beat right away: the jobs of the dead workers are failed at startup
+    heartbeat_task = asyncio.create_task(run_import_heartbeat())
+    retention_task = asyncio.create_task(run_retention())
+    outbox_task = asyncio.create_task(run_outbox())
+
+    yield
+
+    heartbeat_task.cancel()
+    retention_task.cancel()
+    outbox_task.cancel()
+    await smtp_pool.close_all()
+    import_executor.shutdown(wait=False, cancel_futures=True)
+    hashing_executor.shutdown(wait=False, cancel_futures=True)
+    shutdown_validation_executor()
+
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(employee.app)
 app.include_router(auth.app)
+app.include_router(metrics.app)
+app.include_router(email.app)
 
 #fixme: please use specific origins
 app.add_middleware(
@@ -15,4 +44,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Last-Write"],
 )
+
+app.add_middleware(LastWriteMiddleware)
@@ -5,3 +5,7 @@ from .employeeRole import EmployeeRole
 from .jwtBlacklist import JwtBlacklist
 from .resetPassword import ResetPassword
 from .error import Error
+from .importJob import ImportJob
+from .importReport import ImportReport
+from .tableVersion import TableVersion
+from .emailOutbox import EmailOutbox
@@ -8,6 +8,5 @@ class AccountActivation(Base):
     id = Column(Integer, primary_key = True)
     employee_id= Column(Integer, ForeignKey("employees.id"), nullable = False)
     email = Column(String, nullable = False)
-    token = Column(String, nullable = False)
     status = Column(Enum(TokenStatus), nullable = False)
-    created_on = Column(DateTime, nullable = False, server_default=func.now())
+    created_on = Column(DateTime, nullable = False, server_default=func.now(), index = True)
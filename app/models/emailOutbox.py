@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, Enum, DateTime, JSON, Index, func
+from ..database import Base
+from app.enums import EmailStatus, EmailTemplate
+
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True)
+    recipients = Column(JSON, nullable=False)
+    template = Column(Enum(EmailTemplate), nullable=False)
+    body = Column(JSON, nullable=False) # template variables
+    status = Column(Enum(EmailStatus), nullable=False, default=EmailStatus.Pending)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_on = Column(DateTime, nullable=False, server_default=func.now())
+    last_error = Column(String, nullable=True)
+    created_on = Column(DateTime, nullable=False, server_default=func.now())
+    sent_on = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt_on", "status", "next_attempt_on"), # the sender's lookup
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Enum, DateTime, Date, CheckConstraint, func
+from sqlalchemy import Column, Computed, Integer, String, Enum, DateTime, Date, CheckConstraint, Index, func
 from sqlalchemy.orm import relationship
 from ..database import Base
 from app.enums import Gender, ContractType, AccountStatus
@@ -21,6 +21,7 @@ class Employee(Base):
     account_status = Column(Enum(AccountStatus), nullable=False, default=AccountStatus.Inactive)
     phone_number = Column(String, nullable=True)
     created_on = Column(DateTime, nullable=False, server_default=func.now())
+    full_name = Column(String, Computed("lower(first_name || ' ' || last_name)", persisted=True)) # name search
 
     roles = relationship("EmployeeRole")
 
@@ -29,4 +30,6 @@ class Employee(Base):
             "(contract_type IN ('Cdi', 'Cdd') AND cnss_number IS NOT NULL AND cnss_number ~ '^\d{8}-\d{2}$') OR (contract_type IN ('Apprenti', 'Sivp') AND (cnss_number IS NULL OR cnss_number ~ '^\d{8}-\d{2}$'))",
             name="ck_employees_cnss_number"
         ),
+        Index("ix_employees_created_on_id", "created_on", "id"), # order of /employee/all
+        Index("ix_employees_full_name_trgm", "full_name", postgresql_using="gin", postgresql_ops={"full_name": "gin_trgm_ops"}),
     )
@@ -6,5 +6,5 @@ class EmployeeRole(Base):
     __tablename__ = "employee_roles"
 
     id = Column(Integer, primary_key = True, nullable = False)
-    employee_id= Column(Integer, ForeignKey("employees.id"), nullable = False)
+    employee_id= Column(Integer, ForeignKey("employees.id"), nullable = False, index = True) # roles of a page of employees
     role = Column(Enum(RoleType), nullable = False)
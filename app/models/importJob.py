@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, DateTime, Enum, JSON, String, func
+from ..database import Base
+from app.enums import JobStatus
+
+
+class ImportJob(Base):
+    __tablename__ = "import_jobs"
+
+    id = Column(Integer, primary_key=True)
+    status = Column(Enum(JobStatus), nullable=False, default=JobStatus.Pending)
+    total_lines = Column(Integer, nullable=False)
+    processed_lines = Column(Integer, nullable=False, default=0)
+    added_lines = Column(Integer, nullable=False, default=0)
+    result = Column(JSON, nullable=True) # ImportResponse once the job is finished
+    created_on = Column(DateTime, nullable=False, server_default=func.now())
+    finished_on = Column(DateTime, nullable=True)
+    owner = Column(String, nullable=True) # host:pid of the worker running the job (it lives in that process memory)
+    heartbeat_on = Column(DateTime, nullable=False, server_default=func.now()) # db clock, refreshed by the owner
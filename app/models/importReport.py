@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, DateTime, JSON, func
+from ..database import Base
+
+
+class ImportReport(Base):
+    __tablename__ = "import_reports"
+
+    id = Column(Integer, primary_key=True)
+    error_count = Column(Integer, nullable=False)
+    warning_count = Column(Integer, nullable=False)
+    wrong_cell_count = Column(Integer, nullable=False)
+    issues = Column(JSON, nullable=False) # list of schemas.ImportIssueGroup
+    created_on = Column(DateTime, nullable=False, server_default=func.now())
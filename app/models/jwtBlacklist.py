@@ -0,0 +1,10 @@
+from sqlalchemy import Column, DateTime, Integer, String, func
+from ..database import Base
+
+class JwtBlacklist(Base):
+    __tablename__ = "jwt_blacklist"
+
+    id = Column(Integer, primary_key = True, nullable = False)
+    token = Column(String, nullable = False, unique = True) # jti of the revoked token
+    expires_on = Column(DateTime, nullable = False, index = True) # the row is useless once the token expired
+    created_on = Column(DateTime, nullable = False, server_default = func.now(), index = True)
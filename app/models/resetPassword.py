@@ -9,6 +9,5 @@ class ResetPassword(Base):
     id = Column(Integer, primary_key=True, nullable=False)
     employee_id = Column(Integer, ForeignKey("employees.id"), nullable=False)
     email = Column(String, nullable=False)
-    token = Column(String, nullable=False)
     status = Column(Enum(TokenStatus), nullable=False)
-    created_on = Column(DateTime, nullable=False, server_default=func.now())
+    created_on = Column(DateTime, nullable=False, server_default=func.now(), index=True)
@@ -0,0 +1,10 @@
+from sqlalchemy import BigInteger, Column, DateTime, String, func
+from ..database import Base
+
+
+class TableVersion(Base):
+    __tablename__ = "table_versions"
+
+    name = Column(String, primary_key=True) # "employees" for the employees and their roles
+    version = Column(BigInteger, nullable=False, default=0) # bumped in the transaction of every write
+    updated_on = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
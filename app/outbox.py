@@ -0,0 +1,64 @@
+import asyncio
+import logging
+
+from app.config import settings
+from app.crud.email import OutboxEmail, claim_outbox_emails, record_email_attempt
+from app.database import SessionLocal
+from app.external_services import emailService
+
+logger = logging.getLogger(__name__)
+
+
+def claim_emails():
+    db = SessionLocal()
+    try:
+        emails = claim_outbox_emails(db, settings.outbox_batch_size)
+        db.commit()
+        return emails
+    finally:
+        db.close()
+
+def record_attempts(results: list[tuple[OutboxEmail, str | None]]):
+    db = SessionLocal()
+    try:
+        for email, error in results:
+            record_email_attempt(db, email, error)
+        db.commit()
+    finally:
+        db.close()
+
+async def send_outbox_emails(emails: list[OutboxEmail]):
+    # one batch over the pooled smtp connections, the error of every email (None when sent)
+    try:
+        errors = await emailService.send_batch([(email.recipients, email.body, email.template) for email in emails])
+    except Exception as e:
+        errors = [str(e) or type(e).__name__] * len(emails)
+
+    for email, error in zip(emails, errors):
+        if error:
+            logger.warning("outbox: email %s attempt %s failed: %s", email.id, email.attempts, error)
+    return list(zip(emails, errors))
+
+async def drain_outbox():
+    """
+    sends the due emails batch after batch until there is none, returns the number of attempts
+    """
+    attempted = 0
+    while True:
+        emails = await asyncio.to_thread(claim_emails)
+        if not emails:
+            return attempted
+
+        results = await send_outbox_emails(emails)
+        await asyncio.to_thread(record_attempts, results)
+        attempted += len(emails)
+
+async def run_outbox():
+    # started by the app lifespan, every worker drains the outbox: rows claimed by one are skipped by the others
+    while True:
+        try:
+            await drain_outbox()
+        except Exception:
+            logger.exception("outbox failed")
+
+        await asyncio.sleep(settings.outbox_poll_interval)
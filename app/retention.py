@@ -0,0 +1,40 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import and_
+
+from app import enums, models
+from app.config import settings
+from app.crud.auth import delete_in_batches
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+def purge_expired_rows():
+    """
+    deletes the activation/reset codes expired for more than code_retention_hours (used or not)
+    the revoked jwt already expired and the sent emails as old (their body holds the codes), returns {table: deleted rows}
+    """
+    codes_expired_before = datetime.now() - timedelta(seconds=settings.code_expire_seconds, hours=settings.code_retention_hours)
+    db = SessionLocal()
+    try:
+        return {
+            models.AccountActivation.__tablename__: delete_in_batches(db, models.AccountActivation, models.AccountActivation.created_on < codes_expired_before, settings.retention_batch_size),
+            models.ResetPassword.__tablename__: delete_in_batches(db, models.ResetPassword, models.ResetPassword.created_on < codes_expired_before, settings.retention_batch_size),
+            models.JwtBlacklist.__tablename__: delete_in_batches(db, models.JwtBlacklist, models.JwtBlacklist.expires_on < datetime.now(), settings.retention_batch_size),
+            models.EmailOutbox.__tablename__: delete_in_batches(db, models.EmailOutbox, and_(models.EmailOutbox.status == enums.EmailStatus.Sent, models.EmailOutbox.sent_on < codes_expired_before), settings.retention_batch_size),
+        }
+    finally:
+        db.close()
+
+async def run_retention():
+    # started by the app lifespan, every worker runs it: deleting twice is harmless
+    while True:
+        try:
+            deleted = await asyncio.to_thread(purge_expired_rows)
+            logger.info("retention: deleted %s", deleted)
+        except Exception:
+            logger.exception("retention failed")
+
+        await asyncio.sleep(settings.retention_interval)
@@ -1,15 +1,18 @@
+import time
 from app import models, enums
 from app import schemas
-from app.OAuth2 import ACCESS_TOKEN_EXPIRE_MINUTES, authenticate_employee, create_access_token, get_password_hash
-from app.crud.auth import add_reset_code, edit_confirmation_code, edit_reset_code, get_confirmation_code, get_reset_code
+import jwt
+from app.OAuth2 import ACCESS_TOKEN_EXPIRE_MINUTES, ALGORITHM, SECRET_KEY, authenticate_employee, create_access_token, decode_token, get_password_hash, revoke_token, revoked_tokens
+from app.crud.auth import ACTIVATION_CODE, RESET_CODE, add_reset_code, edit_confirmation_code, edit_reset_code, get_confirmation_code, get_reset_code, read_code, sign_code
+from app.crud.email import add_outbox_email
 from app.crud.employee import sudo_edit_employee, get_employee_by_email
-from app.crud.error import add_error, get_error_message
-from app.dependencies import DbDep, formDataDep
+from app.crud.error import add_error, add_error_async, get_error_message
+from app.dependencies import AsyncDbDep, DbDep, formDataDep, tokenDep
+from app.limiter import limit_rate
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Request, status
 
-from app.external_services import emailService
-from datetime import datetime, timedelta
+from datetime import timedelta
 
 app = APIRouter(
     tags=["Authentication"],
@@ -19,9 +22,10 @@ app = APIRouter(
 error_keys = {}
 
 @app.post("/token")
-async def login(db: DbDep, form_data: formDataDep):
+async def login(db: AsyncDbDep, form_data: formDataDep, request: Request):
+    limit_rate("token", request, form_data.username)
     try:
-        employee = authenticate_employee(db, form_data.username, form_data.password)
+        employee = await authenticate_employee(db, form_data.username, form_data.password)
         if not employee:
                 raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -44,41 +48,82 @@ async def login(db: DbDep, form_data: formDataDep):
             }, 
             expires_delta = access_token_expires
         )
+    except HTTPException:
+        # 401 and the hashing back-pressure 503 (Retry-After) reach the client as they are
+        raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         text = str(e)
-        add_error(text, db)
+        await add_error_async(text, db)
         return schemas.BaseOut(status_code=500, detail=text)
     
     return schemas.Token(access_token=access_token, token_type="bearer", detail="Welcome, you're logged in", status_code = 200)
 
+def revoke_payload(db: DbDep, payload: dict):
+    if "jti" not in payload:
+        return schemas.BaseOut(status_code=400, detail="this token can't be revoked, it expires in less than {} minutes".format(ACCESS_TOKEN_EXPIRE_MINUTES))
+
+    if payload["jti"] in revoked_tokens:
+        return schemas.BaseOut(status_code=200, detail="token already revoked")
+
+    try:
+        revoke_token(db, payload)
+    except Exception as e:
+        db.rollback()
+        text = str(e)
+        add_error(text, db)
+        return schemas.BaseOut(status_code=500, detail=get_error_message(text, error_keys))
+
+    return schemas.BaseOut(status_code=200, detail="token revoked")
+
+@app.post("/logout", response_model=schemas.BaseOut)
+def logout(db: DbDep, token: tokenDep):
+    return revoke_payload(db, decode_token(db, token))
+
+@app.post("/revoke", response_model=schemas.BaseOut)
+def revoke(entry: schemas.RevokeToken, db: DbDep, token: tokenDep):
+    # the employee revokes one of his tokens (ex: stolen), an admin any token
+    current_payload = decode_token(db, token)
+    try:
+        payload = jwt.decode(entry.token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.InvalidTokenError:
+        return schemas.BaseOut(status_code=400, detail="invalid or expired token, nothing to revoke")
+
+    if payload.get("email") != current_payload["email"] and enums.RoleType.ADMIN.value not in current_payload.get("roles", []):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only admins can revoke the tokens of other employees")
+
+    return revoke_payload(db, payload)
+
 @app.patch("/confirmAccount", response_model=schemas.BaseOut)
-def confirm_account(confirAccountInput: schemas.ConfirmAccount, db: DbDep):
+async def confirm_account(confirAccountInput: schemas.ConfirmAccount, db: AsyncDbDep):
     try:
-        confirmation_code = get_confirmation_code(db, confirAccountInput.confirmation_code)
+        # junk, tampered and expired codes never reach the database
+        signed_code = read_code(ACTIVATION_CODE, confirAccountInput.confirmation_code)
+        if not signed_code:
+            return schemas.BaseOut(status_code=400, detail="token does not exist")
+
+        if signed_code.expires_at < time.time():
+            return schemas.BaseOut(status_code=400, detail="token expired")
+
+        confirmation_code = await get_confirmation_code(db, signed_code.id)
 
         if not confirmation_code:
             return schemas.BaseOut(status_code=400, detail="token does not exist")
         
         if confirmation_code.status == enums.TokenStatus.Used:
             return schemas.BaseOut(status_code=400, detail="token already used")
-        
-        diff = (datetime.now() - confirmation_code.created_on).seconds
-
-        if diff > 3600:
-            return schemas.BaseOut(status_code=400, detail="token expired")
 
         # employee become active => he can start using the app
-        sudo_edit_employee(db, confirmation_code.employee_id, {models.Employee.account_status: enums.AccountStatus.Active})
+        await sudo_edit_employee(db, confirmation_code.employee_id, {models.Employee.account_status: enums.AccountStatus.Active})
 
         # token used => you cannot use it again (to test mahmoud)
-        edit_confirmation_code(db, confirmation_code.id, {models.AccountActivation.status: enums.TokenStatus.Used})
+        await edit_confirmation_code(db, confirmation_code.id, {models.AccountActivation.status: enums.TokenStatus.Used})
 
-        db.commit()
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         text = str(e)
-        add_error(text, db)
+        await add_error_async(text, db)
         return schemas.BaseOut(status_code=500, detail=get_error_message(text, error_keys))
         
     return schemas.BaseOut(
@@ -87,26 +132,26 @@ def confirm_account(confirAccountInput: schemas.ConfirmAccount, db: DbDep):
     )
 
 @app.post('/forgotPassword', response_model = schemas.BaseOut)
-async def forgot_password(entry: schemas.ForgetPassword, db: DbDep):
-    employee = get_employee_by_email(db, entry.email)
+async def forgot_password(entry: schemas.ForgetPassword, db: AsyncDbDep, request: Request):
+    limit_rate("forgotPassword", request, entry.email)
+    employee = await get_employee_by_email(db, entry.email)
     if not employee:
         return schemas.BaseOut(
             detail = "No account with this email",
             status_code = status.HTTP_404_NOT_FOUND
         )
     try:
-        reset_code = add_reset_code(db, employee)
-        db.flush()
-        await emailService.simple_send([employee.email], {
+        reset_code = await add_reset_code(db, employee)
+        add_outbox_email(db, [employee.email], {
                 'name': employee.first_name,
-                'code': reset_code.token,
+                'code': sign_code(RESET_CODE, reset_code.id),
             }, enums.EmailTemplate.ResetPassword,
         )
-        db.commit()
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         text = str(e)
-        add_error(text, db)
+        await add_error_async(text, db)
         return schemas.BaseOut(status_code=500, detail=get_error_message(text, error_keys)) 
         
     return schemas.BaseOut(
@@ -115,9 +160,16 @@ async def forgot_password(entry: schemas.ForgetPassword, db: DbDep):
     )
 
 @app.patch("/resetPassword", response_model=schemas.BaseOut)
-def reset_password(entry: schemas.ResetPassword, db: DbDep):
+async def reset_password(entry: schemas.ResetPassword, db: AsyncDbDep):
     try:
-        reset_code = get_reset_code(db, entry.reset_code)
+        signed_code = read_code(RESET_CODE, entry.reset_code)
+        if not signed_code:
+            return schemas.BaseOut(status_code=400, detail="token does not exist")
+
+        if signed_code.expires_at < time.time():
+            return schemas.BaseOut(status_code=400, detail="token expired")
+
+        reset_code = await get_reset_code(db, signed_code.id)
 
         if not reset_code:
             return schemas.BaseOut(status_code=400, detail="token does not exist")
@@ -125,23 +177,20 @@ def reset_password(entry: schemas.ResetPassword, db: DbDep):
         if reset_code.status == enums.TokenStatus.Used:
             return schemas.BaseOut(status_code=400, detail="token already used")
         
-        diff = (datetime.now() - reset_code.created_on).seconds
-
-        if diff > 3600:
-            return schemas.BaseOut(status_code=400, detail="token expired")
-        
         if entry.password != entry.confirm_password:
             return schemas.BaseOut(status_code=400, detail="passwords do not match")
         
-        sudo_edit_employee(db, reset_code.employee_id, {models.Employee.password: get_password_hash(entry.password)})
+        await sudo_edit_employee(db, reset_code.employee_id, {models.Employee.password: await get_password_hash(entry.password)})
         # token used => you cannot use it again (to test mahmoud)
-        edit_reset_code(db, reset_code.id, {models.ResetPassword.status: enums.TokenStatus.Used})
+        await edit_reset_code(db, reset_code.id, {models.ResetPassword.status: enums.TokenStatus.Used})
 
-        db.commit()
+        await db.commit()
+    except HTTPException:
+        raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         text = str(e)
-        add_error(text, db)
+        await add_error_async(text, db)
         return schemas.BaseOut(status_code=500, detail=get_error_message(text, error_keys))
         
     return schemas.BaseOut(
@@ -0,0 +1,51 @@
+from fastapi import APIRouter, HTTPException
+
+from app import enums, schemas
+from app.OAuth2 import decode_token
+from app.crud.email import get_outbox_emails, resend_outbox_email
+from app.crud.employee import div_ceil
+from app.crud.error import add_error, get_error_message
+from app.dependencies import DbDep, paginationParams, tokenDep
+
+app = APIRouter(
+    prefix="/emails",
+    tags=["Emails"],
+)
+
+error_keys = {}
+
+def check_admin(db: DbDep, token: str):
+    # the outbox holds the emails of every employee (role from the token claims, like /revoke)
+    if enums.RoleType.ADMIN.value not in decode_token(db, token).get("roles", []):
+        raise HTTPException(status_code=403, detail="Only admins can manage the emails")
+
+@app.get("/", response_model=schemas.EmailsOut)
+def get(db: DbDep, token: tokenDep, pagination_param: paginationParams, status: enums.EmailStatus = None):
+    # status=Dead: the emails given up after outbox_max_attempts failures
+    check_admin(db, token)
+    emails, total_records = get_outbox_emails(db, status, pagination_param)
+
+    return schemas.EmailsOut(
+        status_code=200,
+        detail="Emails",
+        list=emails,
+        page_number=pagination_param.page_number,
+        page_size=pagination_param.page_size,
+        total_pages=div_ceil(total_records, pagination_param.page_size),
+        total_records=total_records,
+    )
+
+@app.post("/{id}/resend", response_model=schemas.BaseOut)
+def resend(id: int, db: DbDep, token: tokenDep):
+    check_admin(db, token)
+    try:
+        if not resend_outbox_email(db, id):
+            return schemas.BaseOut(status_code=404, detail="No email with this id")
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        text = str(e)
+        add_error(text, db)
+        return schemas.BaseOut(status_code=500, detail=get_error_message(text, error_keys))
+
+    return schemas.BaseOut(status_code=200, detail="Email queued, it will be sent again")
@@ -1,16 +1,35 @@
-from typing import Annotated
-from fastapi import APIRouter, Depends
+import csv
+import hashlib
+import io
+import json
+import zlib
+from collections import defaultdict, namedtuple
+from concurrent.futures.process import BrokenProcessPool
+from itertools import chain, groupby
+from operator import itemgetter
+from typing import Annotated, Callable, Iterable, Iterator
+from fastapi import APIRouter, Depends, Form, Request, Response, UploadFile
+from fastapi.responses import StreamingResponse
 import uuid
-from fastapi import HTTPException, BackgroundTasks
+from fastapi import HTTPException
 from sqlalchemy import func
 from sqlalchemy.orm import Session
 from app import crud, models, schemas, enums
 from datetime import datetime
 import re
-from app.crud.employee import add_employee, edit_employee, get_employees
-from app.database import get_db
-from app.dependencies import DbDep, paginationParams, currentEmployee, get_current_employee
-from app.external_services import emailService
+from app.cache import TTLCache
+from app.config import settings
+from app.crud.email import add_outbox_emails
+from app.crud.employee import add_employee, add_imported_employees, decode_cursor, div_ceil, edit_employee, employee_out_columns, get_duplicated_rows, get_employees, get_employees_after, get_roles_per_employee, iter_employees_batches
+from app.crud.error import add_error_async, add_error_on_primary
+from app.crud.job import add_import_job, add_import_report, edit_import_job, get_import_job, get_import_report
+from app.crud.version import EMPLOYEES, get_table_version
+from app.database import SessionLocal, read_session_factory
+from app.dependencies import AsyncDbDep, DbDep, ReadDbDep, paginationParams, currentEmployee, get_current_employee
+from app.http_cache import PreparedJson, is_not_modified, validator_headers
+from app.limiter import limit_rate
+from app import workers
+from app.workers import get_worker_id, import_executor
 
 app = APIRouter(
     prefix="/employee",
@@ -26,26 +45,30 @@ error_keys = {
 }
 
 @app.post("/")
-async def add(employee: schemas.EmployeeCreate, db: Session = Depends(get_db), current_user = Depends(get_current_employee)):
+async def add(employee: schemas.EmployeeCreate, db: AsyncDbDep, current_user = Depends(get_current_employee)):
     try:
         await add_employee(db=db, employee=employee)
+    except HTTPException:
+        raise
     except Exception as e:
-        db.rollback()   
+        await db.rollback()   
         text = str(e)
-        add_error(text, db)
+        await add_error_async(text, db)
         return schemas.BaseOut(status_code=500, detail=get_error_message(text, error_keys))
 
     return schemas.BaseOut(status_code=201, detail="Employee added and email sent for confirmation")
 
 
 @app.put("/{id}", response_model=schemas.BaseOut)
-async def edit(id: int, entry: schemas.EmployeeEdit, db: DbDep):
+async def edit(id: int, entry: schemas.EmployeeEdit, db: AsyncDbDep):
     try:
         await edit_employee(db, id, entry)
+    except HTTPException:
+        raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         text = str(e)
-        add_error(text, db)
+        await add_error_async(text, db)
         raise HTTPException(status_code=500, detail=get_error_message(text, error_keys))
     
     return schemas.BaseOut(
@@ -54,23 +77,108 @@ async def edit(id: int, entry: schemas.EmployeeEdit, db: DbDep):
     )
 
 @app.get("/all", response_model=schemas.EmployeesOut)
-def get(db: DbDep, pagination_param: paginationParams, name_substr: str = None, current_user = Depends(get_current_employee)):
+def get(request: Request, response: Response, db: ReadDbDep, pagination_param: paginationParams, name_substr: str = None, cursor: str = None, count: enums.CountMode = enums.CountMode.Exact, current_user = Depends(get_current_employee)):
+    # cursor given => keyset pagination (cursor= empty for the first page, then the next_cursor of the previous one)
+    # page_number is ignored and there is no count, deep pages cost as much as the first one
+    after = None
+    if cursor:
+        after = decode_cursor(cursor)
+        if after is None:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
     try:
-        employees, total_records, total_pages = get_employees(db, pagination_param, name_substr)
+        # read with the data (same database): unchanged employees => 304 without querying them
+        version, updated_on = get_table_version(db, EMPLOYEES)
+        headers = validator_headers(f'W/"{EMPLOYEES}-{version}"', updated_on, "private, no-cache")
+        if is_not_modified(request, headers["ETag"], updated_on):
+            return Response(status_code=304, headers=headers)
+
+        if cursor is None:
+            employees, total_records, total_pages, total_records_exact = get_employees(db, pagination_param, name_substr, count)
+        else:
+            employees, next_cursor = get_employees_after(db, pagination_param.page_size, name_substr, after)
+        roles_per_employee = get_roles_per_employee(db, [employee.id for employee in employees])
     except Exception as e:
         db.rollback()
         text = str(e)
-        add_error(text, db)
+        add_error_on_primary(text)
         raise HTTPException(status_code=500, detail=get_error_message(text, error_keys))
+
+    employees_out = [schemas.EmployeeOut(**employee._mapping, roles=roles_per_employee[employee.id]) for employee in employees]
+    response.headers.update(headers)
+    if cursor is not None:
+        return schemas.EmployeesOut(
+            status_code=200,
+            detail="All employees",
+            list=employees_out,
+            page_size=pagination_param.page_size,
+            next_cursor=next_cursor,
+        )
     
     return schemas.EmployeesOut(
         status_code=200,
         detail="All employees",
-        list=[schemas.EmployeeOut(**employee.__dict__, roles=[employee_role.role for employee_role in employee.roles]) for employee in employees], # to update later
+        list=employees_out,
         page_number=pagination_param.page_number, 
         page_size=pagination_param.page_size,
         total_pages=total_pages,
         total_records = total_records,
+        total_records_exact=total_records_exact,
+    )
+
+export_media_types = {
+    enums.ExportFormat.Csv: "text/csv; charset=utf-8",
+    enums.ExportFormat.Ndjson: "application/x-ndjson",
+}
+
+def export_chunk(rows, roles_per_employee, format: enums.ExportFormat):
+    if format == enums.ExportFormat.Ndjson:
+        return "".join(schemas.EmployeeOut(**row._mapping, roles=roles_per_employee[row.id]).model_dump_json() + "\n" for row in rows)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([*(value.value if isinstance(value, enums.BasicEnum) else value for value in row), ",".join(role.value for role in roles_per_employee[row.id])])
+
+    return buffer.getvalue()
+
+def export_chunks(db: Session, name_substr: str, format: enums.ExportFormat, compress: bool):
+    # runs while the response is sent: owns its session (the request's one is already closed)
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if compress else None # gzip container
+    try:
+        chunks = (export_chunk(rows, roles_per_employee, format).encode() for rows, roles_per_employee in iter_employees_batches(db, name_substr, settings.export_batch_size))
+        if format == enums.ExportFormat.Csv:
+            chunks = chain([(",".join([column.key for column in employee_out_columns] + ["roles"]) + "\r\n").encode()], chunks)
+
+        for chunk in chunks:
+            if compressor:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+
+        if compressor:
+            yield compressor.flush()
+    except Exception as e:
+        # headers already sent: the client sees a truncated download
+        db.rollback()
+        add_error_on_primary(str(e))
+        raise
+    finally:
+        db.close()
+
+@app.get("/export")
+def export(request: Request, format: enums.ExportFormat = enums.ExportFormat.Csv, compress: bool = False, name_substr: str = None, current_user = Depends(get_current_employee)):
+    """
+    streams all the (filtered) employees, whatever their number, in constant memory
+    compress => gzip file compressed on the fly
+    """
+    limit_rate("export", request, getattr(current_user, "email", None))
+    filename = f"employees.{format.value}{'.gz' if compress else ''}"
+
+    return StreamingResponse(
+        export_chunks(read_session_factory(request)(), name_substr, format, compress),
+        media_type="application/gzip" if compress else export_media_types[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
 
 email_regex = r'^\S+@\S+\.\S+$'
@@ -133,12 +241,20 @@ options = [
     ]),
 ]
 
-def is_regex_matched(pattern, field):
-    return field if re.match(pattern, field) else None #netchikiw idha warning nkhaliwha non, idha error (mandatory) -> error
+# static: serialized once, then served as bytes with its etag
+possible_fields_json = PreparedJson(schemas.ImportPossibleFields(possible_fields=options))
+
+# compiled once, not looked up in re's cache for every cell
+email_pattern = re.compile(email_regex)
+cnss_pattern = re.compile(cnss_regex)
+phone_number_pattern = re.compile(phone_number_regex)
+
+def is_regex_matched(pattern: re.Pattern, field):
+    return field if pattern.match(field) else None #netchikiw idha warning nkhaliwha non, idha error (mandatory) -> error
 
 #fixme: move later to utils file
 def is_valid_email(field: str):
-    return field if is_regex_matched(email_regex, field) else None
+    return is_regex_matched(email_pattern, field)
 
 def is_positive_int(field: str):
     try:
@@ -163,12 +279,12 @@ def isCdiOrCdd(employee):
     return employee["contract_type"].value in [enums.ContractType.Cdi, enums.ContractType.Cdd]
 
 def is_valid_cnss_number(field):
-    return field if is_regex_matched(cnss_regex, field) else None
+    return is_regex_matched(cnss_pattern, field)
     # idha mch shyh ama type contract mch cdi, cdd => warning
     # => error
 
 def is_valid_phone_number(field):
-    return field if is_regex_matched(phone_number_regex, field) else None
+    return is_regex_matched(phone_number_pattern, field)
 
 def are_roles_valid(field):
     # Admin,  venDor,  
@@ -185,146 +301,222 @@ def are_roles_valid(field):
 
 fields_check = {
     # field to validate: (function to validate, error message if not valid)
-    "email": (lambda field: is_valid_email(field), "Wrong Email format"),
-    "gender": (lambda field: enums.Gender.is_valid_enum_value(field), f"Possible values are: { enums.Gender.getPossibleValues() }"),
-    "contract_type": (lambda field: enums.ContractType.is_valid_enum_value(field), f"Possible values are: { enums.ContractType.getPossibleValues() }"),
-    "number": (lambda field: is_positive_int(field), "It Should be an integer >= 0"),
-    "birth_date": (lambda field: is_valid_date(field), "Dates format should be dd/mm/YYYY"),
-    "cnss_number": (lambda field: is_valid_cnss_number(field), "It should be {8 digits}-{2 digits} and it's Mandatory for Cdi and Cdd"),
-    "phone_number": (lambda field: is_valid_phone_number(field), "Phone number is not valid for tunisia, it shoud be of 8 digits"),
-    "employee_roles": (lambda field: are_roles_valid(field), f"Possible values are: { enums.RoleType.getPossibleValues() }"),
+    "email": (is_valid_email, "Wrong Email format"),
+    "gender": (enums.Gender.is_valid_enum_value, f"Possible values are: { enums.Gender.getPossibleValues() }"),
+    "contract_type": (enums.ContractType.is_valid_enum_value, f"Possible values are: { enums.ContractType.getPossibleValues() }"),
+    "number": (is_positive_int, "It Should be an integer >= 0"),
+    "birth_date": (is_valid_date, "Dates format should be dd/mm/YYYY"),
+    "cnss_number": (is_valid_cnss_number, "It should be {8 digits}-{2 digits} and it's Mandatory for Cdi and Cdd"),
+    "phone_number": (is_valid_phone_number, "Phone number is not valid for tunisia, it shoud be of 8 digits"),
+    "employee_roles": (are_roles_valid, f"Possible values are: { enums.RoleType.getPossibleValues() }"),
+}
+
+field_display_names = {
+    **mandatory_fields,
+    **optional_fields,
+    **{field: display_name for field, (display_name, _) in mandatory_with_condition.items()},
 }
 
+# columns where all the values can be checked by one regex call on the whole column (usual case: a valid column)
+# field: (regex of a valid value, conversion of a valid value), if the column does not match, each value goes through fields_check
+# the regexes accept a subset of the fields_check values (stricter is fine, it only sends the column to the slow path)
+# and can match a value in one way only: \S+@\S+\.\S+ can split x@y.com.tn in many ways and the joined column
+# then backtracks exponentially on a wrong last value
+column_checks = {
+    "email": (r'[^@\s]+@[^@\s.]+(?:\.[^@\s.]+)+', None),
+    "number": (r'\d+', int),
+    "cnss_number": (r'\d{8}-\d{2}', None),
+    "phone_number": (r'\d{8}', None),
+}
+
+def compile_column_check(value_regex: str):
+    # value => value\nvalue\n...value, values are stripped and the regexes never match \n
+    return re.compile(f"(?:{value_regex}\n)*{value_regex}")
+
+# compiled once from the definitions above, one step per column:
+# (field, display name, always mandatory ?, mandatory with condition ?, (check, error message) or None, (column pattern, conversion) or None)
+validation_plan = [
+    (
+        field, field_display_names[field], field in mandatory_fields, field in mandatory_with_condition, fields_check.get(field),
+        (compile_column_check(column_checks[field][0]), column_checks[field][1]) if field in column_checks else None,
+    )
+    for field in possible_fields
+]
+
 def is_field_mandatory(employee, field):
     return field in mandatory_fields or (field in mandatory_with_condition and mandatory_with_condition[field][1](employee))
 
-#employee wehed 
-def validate_employee_data(employee):
+def validate_employees_columns(employees: list):
+    """
+    validate the whole file column by column instead of line by line: the plan steps are
+    resolved once per column and every distinct value of a column is checked only once
+    (same dates, contract types, roles... repeat a lot), the result is the same as
+    validating each line on its own
+    returns, for each line: (errors, warnings, wrong cells as (message, field), converted values)
+    """
+    row_errors = defaultdict(list)
+    row_warnings = defaultdict(list)
+    row_wrong_cells = defaultdict(list)  # bech nraj3ouhom ll matchy ylawanhom bel a7mer
+    columns = []
+
+    for field, display_name, mandatory, has_condition, check, column_check in validation_plan:
+        values = [employee[field].value.strip() if field in employee else None for employee in employees]
+
+        if column_check and values and None not in values and column_check[0].fullmatch(('\n').join(values)):
+            columns.append(list(map(column_check[1], values)) if column_check[1] else values)
+            continue
+
+        distinct_values = set(values)
+
+        # None: missing cell, '': empty cell => null in db (or error if mandatory)
+        converted_values = {None: None, '': None}
+        if check:
+            for value in distinct_values - converted_values.keys():
+                converted_values[value] = check[0](value) #if not convered_val khater ken je 3ana type bool => False valid value, int >= 0 converted_val = 0
+        wrong_values = {value for value in distinct_values if converted_values.get(value, value) is None}
+
+        # slow path only for the lines having something wrong in this column
+        for row in [row for row, value in enumerate(values) if value in wrong_values] if wrong_values else []:
+            value = values[row]
+            is_mandatory = mandatory or (has_condition and mandatory_with_condition[field][1](employees[row]))
+            if value is None:
+                if is_mandatory:
+                    row_errors[row].append(f"{display_name} is mandatory but missing")
+            elif value == '': #birth date optional = ""
+                if is_mandatory:
+                    msg = f"{display_name} is mandatory but missing"
+                    row_errors[row].append(msg)
+                    row_wrong_cells[row].append((msg, field))
+            else:
+                msg = check[1]
+                (row_errors if is_mandatory else row_warnings)[row].append(msg)
+                row_wrong_cells[row].append((msg, field))
+
+        columns.append(list(map(converted_values.get, values, values)))
+
+    fields = [step[0] for step in validation_plan]
+    return [
+        (row_errors.get(row, ()), row_warnings.get(row, ()), row_wrong_cells.get(row, ()), dict(zip(fields, row_values)))
+        for row, row_values in enumerate(zip(*columns))
+    ]
+
+# what a validation process needs of a cell
+ShardCell = namedtuple("ShardCell", ["value"])
+
+def validate_employees_shard(values: list):
+    # runs in a validation process, values: one {field: cell value} per line
+    return validate_employees_columns([{field: ShardCell(value) for field, value in line.items()} for line in values])
+
+def validate_employees_rows(employees: list):
+    """
+    big files are split in consecutive shards validated in parallel by the validation processes
+    (only the cell values are pickled, not the cells), the results are merged in order so they are the same as in process
+    """
+    executor = workers.validation_executor
+    if not executor or len(employees) < settings.parallel_validation_min_rows:
+        return validate_employees_columns(employees)
+
+    shard_size = div_ceil(len(employees), settings.validation_processes)
+    try:
+        shards = [
+            executor.submit(validate_employees_shard, [{field: cell.value for field, cell in employee.items()} for employee in employees[first_row:first_row + shard_size]])
+            for first_row in range(0, len(employees), shard_size)
+        ]
+        return [result for shard in shards for result in shard.result()]
+    except BrokenProcessPool:
+        # a validation process died (oom...): not forked again from this multi threaded process, validation goes back in process
+        workers.validation_executor = None
+        return validate_employees_columns(employees)
+
+# line content => validation result, a forceUpload resubmission (maybe with some lines edited)
+# only validates the lines it has never seen
+validation_cache = TTLCache(settings.validation_cache_size, settings.validation_cache_ttl)
+
+def employee_row_key(employee: dict):
+    content = ('\x1f').join(f"{field}\x1e{cell.value}" for field, cell in employee.items())
+    return hashlib.blake2b(content.encode(), digest_size=16).digest()
+
+def validate_employees_data(employees: list, line_offset: int = 0):
+    """
+    returns (errors, warnings, wrong_cells, one dict of converted values per line)
+    errors and warnings are (line, message) tuples
+    the result of each line is cached by content, only new or edited lines are validated
+    """
+    keys = [employee_row_key(employee) for employee in employees]
+    results = [validation_cache.get(key) for key in keys]
+
+    missing_rows = [row for row, result in enumerate(results) if result is None]
+    if missing_rows:
+        for row, result in zip(missing_rows, validate_employees_rows([employees[row] for row in missing_rows])):
+            results[row] = result
+            validation_cache.set(keys[row], result)
+
     errors = []
     warnings = []
-    wrong_cells = []  # bech nraj3ouhom ll matchy ylawanhom bel a7mer
-    employee_to_add = { field: cell.value for field, cell in employee.items() }
+    wrong_cells = []
+    employees_data = []
+    for row, (row_errors, row_warnings, row_wrong_cells, values) in enumerate(results):
+        line = row + line_offset + 1
+        errors.extend((line, msg) for msg in row_errors)
+        warnings.extend((line, msg) for msg in row_warnings)
+        # the line may have moved since it was cached, cells positions are the current ones
+        for message, field in row_wrong_cells:
+            cell = employees[row][field]
+            wrong_cells.append(schemas.MatchyWrongCell(message=message, rowIndex=cell.rowIndex, colIndex=cell.colIndex))
+        employees_data.append(dict(values)) # the upload edits it, the cached one must stay untouched
+
+    return (errors, warnings, wrong_cells, employees_data)
+
+def valid_employees_data_and_upload(employees: list, force_upload: bool, db: DbDep, line_offset: int = 0):
+    # line_offset: position of employees[0] in the file (chunked mode)
+    #try:
+        roles_per_email = {}
 
-    for field in possible_fields:
-        if field not in employee:
-            if is_field_mandatory(employee, field):
-                errors.append(f"{possible_fields[field]} is mandatory but missing")
-            continue
+        errors, warnings, wrong_cells, employees_data = validate_employees_data(employees, line_offset)
 
-        cell = employee[field]
-        employee_to_add[field] = employee_to_add[field].strip()
+        keys = [{field: emp[field] for field in unique_fields} for emp in employees_data]
+        duplicated_rows = get_duplicated_rows(db, keys, unique_fields)
+        field_order = list(unique_fields)
+        duplicated_rows.sort(key=lambda duplicated_row: (field_order.index(duplicated_row[1]), duplicated_row[2], duplicated_row[0]))
 
-        if employee_to_add[field] == '': #birth date optional = ""
-            if is_field_mandatory(employee, field):
-                msg = f"{possible_fields[field][0]} is mandatory but missing"
-                errors.append(msg)
-                wrong_cells.append(schemas.MatchyWrongCell(message=msg, rowIndex=cell.rowIndex, colIndex=cell.colIndex))
+        duplicated_in_db = defaultdict(list)
+        for row, field, in_db in duplicated_rows:
+            employee = employees[row]
+            cell = employee[field]
+            if in_db:
+                duplicated_in_db[field].append(row)
+                wrong_cells.append(schemas.MatchyWrongCell(message=f"{possible_fields[field]} should be unique. {keys[row][field]} already exist in database", rowIndex=cell.rowIndex, colIndex=cell.colIndex))
             else:
-                employee_to_add[field] = None # f db tetsab null
-        elif field in fields_check:
-            converted_val = fields_check[field][0](employee_to_add[field])
-            if converted_val is None: #if not convered_val khater ken je 3ana type bool => False valid value, int >= 0 converted_val = 0
-                msg = fields_check[field][1]
-                (errors if is_field_mandatory(employee, field) else warnings).append(msg)
+                msg = f"{possible_fields[field]} should be unique. but this value exists more than one time in the file"
+                (errors if is_field_mandatory(employee, field) else warnings).append((None, msg))
                 wrong_cells.append(schemas.MatchyWrongCell(message=msg, rowIndex=cell.rowIndex, colIndex=cell.colIndex))
-            else:
-                employee_to_add[field] = converted_val
 
-    return (errors, warnings, wrong_cells, employee_to_add)
+        for field, rows in duplicated_in_db.items():
+            duplicated_vals = list(dict.fromkeys(str(keys[row][field]) for row in rows))
+            listed_vals = (', ').join(duplicated_vals[:settings.import_report_inline_issues])
+            if len(duplicated_vals) > settings.import_report_inline_issues:
+                listed_vals += f" and {len(duplicated_vals) - settings.import_report_inline_issues} others"
+            msg = f"{possible_fields[field]} should be unique. {listed_vals} already exist in database"
+            (errors if is_field_mandatory(employees[rows[0]], field) else warnings).append((None, msg))
 
-def valid_employees_data_and_upload(employees: list, force_upload: bool, backgroundTasks: BackgroundTasks, db: DbDep):
-    #try:
-        errors = []
-        warnings = []
-        wrong_cells = []
-        employees_to_add = [] # bech nesta3mlou fil batch add, bech nlemou data lkol w nsobo fard mara
-        roles_per_email = {}
-        
-        roles = []
-        for line, employee in enumerate(employees): # for i in range(len(employees))  line = i, employee = employees[i]
-            emp_errors, emp_warnings, emp_wrong_cells, emp = validate_employee_data(employee)
-            if emp_errors:
-                msg = ('\n').join(emp_errors)
-                errors.append(f"\nLine {line + 1}: \n{msg}")
-            if emp_warnings:
-                msg = ('\n').join(emp_warnings)
-                warnings.append(f"\nLine {line + 1}: \n{msg}")
-            if emp_wrong_cells:
-                wrong_cells.extend(emp_wrong_cells)
-            
+        if errors or (warnings and not force_upload): # oumourou l force mayet3adech idha errors w yet3ada idha warning ama lezem force_upload = True
+            return import_issues_response(errors, warnings, wrong_cells, db)
+        for emp in employees_data:
             roles_per_email[emp.get('email')] = emp.pop('employee_roles') #email unique
             emp['password'] = uuid.uuid1()
-            employees_to_add.append(models.Employee(**emp))
-        
-        for field in unique_fields:
-            values = set()
-            for line, employee in enumerate(employees):
-                cell = employee.get(field)
-                val = cell.value.strip()
-                if val == '': # if it's mandatory, email and number were already checked in fields check
-                    continue
-                if val in values:
-                    msg = f"{possible_fields[field]} should be unique. but this value exists more than one time in the file"
-                    (errors if is_field_mandatory(employee, field) else warnings).append(msg)
-                    wrong_cells.append(schemas.MatchyWrongCell(message=msg, rowIndex=cell.rowIndex, colIndex=cell.colIndex))
-                else:
-                    values.add(val)
-
-            duplicated_vals = db.query(unique_fields[field]).filter(unique_fields[field].in_(values)).all()
-            duplicated_vals = {str(val[0]) for val in duplicated_vals}
-            if duplicated_vals:
-                msg = f"{possible_fields[field]} should be unique. {(', ').join(duplicated_vals)} already exist in database"
-                (errors if is_field_mandatory(employee, field) else warnings).append(msg)
-                for employee in employees:
-                    cell = employee.get(field)
-                    val = cell.value.strip()
-
-                    if val in duplicated_vals:
-                        wrong_cells.append(schemas.MatchyWrongCell(message=f"{possible_fields[field]} should be unique. {val} already exist in database", rowIndex=cell.rowIndex, colIndex=cell.colIndex))
-        
-        if errors or (warnings and not force_upload): # oumourou l force mayet3adech idha errors w yet3ada idha warning ama lezem force_upload = True
-            return schemas.ImportResponse(
-                errors=('\n').join(errors),
-                warnings=('\n').join(warnings),
-                wrong_cells=wrong_cells,
-                detail="something went wrong",
-                status_code=400,
-            )
-        # exercice: add
-        # add_all vs nektbou l query wahadna w laken rod belek w hawel esta3mel l orm le max
-        # n7ebou naarfou role kol user  baed maysirlou add
-        db.add_all(employees_to_add)
-        db.flush() # field id fih value, email mawjoud
-        #case 1: imagine employees lost their order
-        employee_roles = []
-        for emp in employees_to_add:
-            for role in roles_per_email[emp.email]:
-                employee_roles.append(models.EmployeeRole(employee_id=emp.id, role=role))
-
-        db.add_all(employee_roles)
-        db.flush()
-
-        activation_codes_to_add = []
-        email_data = []
-        for emp in employees_to_add:
-            token = uuid.uuid1()
-            activation_code = models.AccountActivation(employee_id=emp.id, email=emp.email, status=enums.TokenStatus.Pending, token=token)
-            activation_codes_to_add.append(activation_code)
-            email_data.append(([emp.email], {
-                'name': emp.first_name,
-                'code': token,
-                'psw': emp.password
-            }))
-
-        db.add_all(activation_codes_to_add)
 
-        # choice 1, wait for the sending (takes time, in case of problem, we rollback all transactions)
-        for email_datum in email_data:
-            backgroundTasks.add_task(emailService.simple_send, email_datum[0], email_datum[1])
-
-        # choice 2, do it using background tasks, if failed, no problem add a btn 'you haven't received an email ? send again'
+        codes_per_email = add_imported_employees(db, employees_data, roles_per_email)
 
+        email_data = [([emp['email']], {
+            'name': emp['first_name'],
+            'code': codes_per_email[emp['email']],
+            'psw': str(emp['password']),
+        }) for emp in employees_data]
 
+        # choice 1, wait for the sending (takes time, in case of problem, we rollback all transactions)
+        # choice 2, do it using background tasks, if failed, no problem add a btn 'you haven't received an email ? send again'
+        # outbox: committed with the chunk (a failing chunk sends nothing), sent and retried by the outbox worker
+        add_outbox_emails(db, email_data, enums.EmailTemplate.ConfirmAccount)
         db.commit()
 
     # except Exception as e:
@@ -338,6 +530,130 @@ def valid_employees_data_and_upload(employees: list, force_upload: bool, backgro
             status_code=201
         )
 
+def format_line_messages(messages: list):
+    # [(line, message)] => "\nLine N: \nmessage 1\nmessage 2" for each line, messages without line as they are
+    formatted = []
+    for line, line_messages in groupby(messages, key=itemgetter(0)):
+        msg = ('\n').join(message for _, message in line_messages)
+        formatted.append(f"\nLine {line}: \n{msg}" if line is not None else msg)
+
+    return ('\n').join(formatted)
+
+def to_ranges(indexes: list):
+    # sorted indexes => [[first, last], ...] of consecutive indexes
+    ranges = []
+    for index in indexes:
+        if ranges and index <= ranges[-1][1] + 1:
+            ranges[-1][1] = index
+        else:
+            ranges.append([index, index])
+
+    return ranges
+
+def group_import_issues(errors: list, warnings: list, wrong_cells: list):
+    """
+    one group per message (and column for the wrong cells) with the lines/rows where it happens as ranges,
+    a column of 100k wrong emails is one group instead of 100k cells
+    """
+    groups = {}
+    for kind, messages in (("error", errors), ("warning", warnings)):
+        for line, message in messages:
+            groups.setdefault((kind, message, None), []).append(line)
+    for cell in wrong_cells:
+        groups.setdefault(("cell", cell.message, cell.colIndex), []).append(cell.rowIndex)
+
+    return [schemas.ImportIssueGroup(
+        kind=kind,
+        message=message,
+        colIndex=col,
+        ranges=to_ranges(sorted(set(index for index in indexes if index is not None))),
+        count=len(indexes),
+    ).model_dump() for (kind, message, col), indexes in groups.items()]
+
+def import_issues_response(errors: list, warnings: list, wrong_cells: list, db: DbDep):
+    """
+    small reports are returned as they are, big ones are stored (grouped) in import_reports:
+    the response only holds the counts and the first issues, the others are paginated by get_import_report_page
+    """
+    inline_issues = settings.import_report_inline_issues
+    if len(errors) + len(warnings) + len(wrong_cells) <= inline_issues:
+        return schemas.ImportResponse(
+            errors=format_line_messages(errors),
+            warnings=format_line_messages(warnings),
+            wrong_cells=wrong_cells,
+            detail="something went wrong",
+            status_code=400,
+        )
+
+    report = add_import_report(db, len(errors), len(warnings), len(wrong_cells), group_import_issues(errors, warnings, wrong_cells))
+    db.commit()
+
+    return schemas.ImportResponse(
+        errors=format_line_messages(errors[:inline_issues]),
+        warnings=format_line_messages(warnings[:inline_issues]),
+        wrong_cells=wrong_cells[:inline_issues],
+        report_id=report.id,
+        error_count=len(errors),
+        warning_count=len(warnings),
+        wrong_cell_count=len(wrong_cells),
+        detail=f"something went wrong, only the first issues are listed, the full report is /employee/imports/reports/{report.id}",
+        status_code=400,
+    )
+
+def split_in_chunks(employees: list, chunk_size: int, start_line: int):
+    for first_line in range(start_line, len(employees), chunk_size):
+        yield first_line, employees[first_line:first_line + chunk_size]
+
+def valid_employees_data_and_upload_by_chunks(employees_chunks: Iterable, force_upload: bool, start_line: int, db: DbDep, on_chunk: Callable | None = None):
+    """
+    employees_chunks: (line of the first employee, employees) for each chunk of the file
+    validate and commit the file chunk by chunk: a failing chunk stops the import
+    but keeps the previous ones, the client resumes with startLine=checkpoint
+    on_chunk is called with each ImportChunkResponse (used to report jobs progress)
+    duplicates of previous chunks are reported as existing in database since they are committed
+    """
+    chunks = []
+    checkpoint = start_line
+
+    for first_line, chunk in employees_chunks:
+        try:
+            res = valid_employees_data_and_upload(chunk, force_upload, db, first_line)
+        except Exception as e:
+            db.rollback()
+            text = str(e)
+            add_error(text, db)
+            res = schemas.ImportResponse(status_code=500, detail=get_error_message(text, error_keys))
+
+        chunks.append(schemas.ImportChunkResponse(**res.model_dump(), first_line=first_line + 1, last_line=first_line + len(chunk)))
+        # committed objects are not needed anymore, keep the session (and the memory) small
+        db.expunge_all()
+        if on_chunk:
+            on_chunk(chunks[-1])
+
+        if res.status_code != 201:
+            return schemas.ChunkedImportResponse(
+                errors=res.errors,
+                warnings=res.warnings,
+                wrong_cells=res.wrong_cells,
+                report_id=res.report_id,
+                error_count=res.error_count,
+                warning_count=res.warning_count,
+                wrong_cell_count=res.wrong_cell_count,
+                detail=f"import stopped at line {first_line + 1}, {checkpoint - start_line} lines added. fix the file then resume with startLine={checkpoint}",
+                status_code=res.status_code,
+                checkpoint=checkpoint,
+                chunks=chunks,
+            )
+
+        checkpoint = first_line + len(chunk)
+
+    return schemas.ChunkedImportResponse(
+        detail="file uploaded",
+        status_code=201,
+        checkpoint=checkpoint,
+        chunks=chunks,
+    )
+
 def add_error(text, db):
     try:
         db.add(models.Error(
@@ -355,23 +671,244 @@ def get_error_message(error_message, error_keys):
         
     return "Something went wrong"
 
-@app.get("/possibleFields")
-def getPossibleFields(db: DbDep):
-    return schemas.ImportPossibleFields(
-        possible_fields=options,
-    )
+@app.get("/possibleFields", response_model=schemas.ImportPossibleFields)
+def getPossibleFields(request: Request):
+    return possible_fields_json.response(request)
 
-@app.post('/test')
-async def upload(entry: schemas.MatchyUploadEntry, backgroundTasks: BackgroundTasks, db: DbDep):
-    employees = entry.lines
-    if not employees: # front lezmou ygeri enou fama au moins ligne
-        return schemas.BaseOut(status_code=400, detail="Nothing to do, empty file")
-
-    missing_mandatory_fields = set(mandatory_fields.keys()) - employees[0].keys() # 3tina thi9a f matchy eli input valid
+def check_mandatory_fields(fields):
+    missing_mandatory_fields = set(mandatory_fields.keys()) - fields
     if missing_mandatory_fields:
         return schemas.BaseOut(
             status_code=400, 
             detail=f"missing mandatory fields: {(', ').join([mandatory_fields[field] for field in missing_mandatory_fields])}"
         )
-    
-    return valid_employees_data_and_upload(employees, entry.forceUpload, backgroundTasks, db)
+
+    return None
+
+def check_upload_entry(entry: schemas.MatchyUploadEntry):
+    employees = entry.lines
+    if not employees: # front lezmou ygeri enou fama au moins ligne
+        return schemas.BaseOut(status_code=400, detail="Nothing to do, empty file")
+
+    missing_fields_error = check_mandatory_fields(employees[0].keys()) # 3tina thi9a f matchy eli input valid
+    if missing_fields_error:
+        return missing_fields_error
+
+    # /imports always runs by chunks (default chunk size) => startLine is checked even without chunkSize
+    if entry.chunkSize is not None and entry.chunkSize <= 0:
+        return schemas.BaseOut(status_code=400, detail="chunkSize should be > 0")
+
+    if entry.startLine is None or not 0 <= entry.startLine < len(employees):
+        return schemas.BaseOut(status_code=400, detail="startLine should be a line of the file")
+
+    return None
+
+@app.post('/test')
+def upload(entry: schemas.MatchyUploadEntry, db: DbDep, request: Request):
+    limit_rate("imports", request)
+    entry_error = check_upload_entry(entry)
+    if entry_error:
+        return entry_error
+
+    employees = entry.lines
+    if entry.chunkSize:
+        return valid_employees_data_and_upload_by_chunks(split_in_chunks(employees, entry.chunkSize, entry.startLine), entry.forceUpload, entry.startLine, db)
+
+    # one transaction from startLine to the end of the file
+    return valid_employees_data_and_upload(employees[entry.startLine:], entry.forceUpload, db, entry.startLine)
+
+def import_job_out(job: models.ImportJob, detail: str, status_code: int):
+    return schemas.ImportJobOut(
+        id=job.id,
+        job_status=job.status,
+        total_lines=job.total_lines,
+        processed_lines=job.processed_lines,
+        added_lines=job.added_lines,
+        created_on=job.created_on,
+        finished_on=job.finished_on,
+        result=job.result,
+        detail=detail,
+        status_code=status_code,
+    )
+
+def run_import_job(job_id: int, employees: list, force_upload: bool, chunk_size: int, start_line: int):
+    # runs in the import_executor threads, outside of any request => own session
+    db = SessionLocal()
+    checkpoint = start_line
+
+    def on_chunk(chunk: schemas.ImportChunkResponse):
+        nonlocal checkpoint
+        progress = {models.ImportJob.processed_lines: chunk.last_line - start_line}
+        if chunk.status_code == 201:
+            checkpoint = chunk.last_line
+            progress[models.ImportJob.added_lines] = checkpoint - start_line
+        edit_import_job(db, job_id, progress)
+        db.commit()
+
+    try:
+        edit_import_job(db, job_id, {models.ImportJob.status: enums.JobStatus.Running})
+        db.commit()
+
+        res = valid_employees_data_and_upload_by_chunks(split_in_chunks(employees, chunk_size, start_line), force_upload, start_line, db, on_chunk)
+    except Exception as e:
+        db.rollback()
+        text = str(e)
+        add_error(text, db)
+        res = schemas.ChunkedImportResponse(status_code=500, detail=get_error_message(text, error_keys), checkpoint=checkpoint)
+
+    try:
+        edit_import_job(db, job_id, {
+            models.ImportJob.status: enums.JobStatus.Done if res.status_code == 201 else enums.JobStatus.Failed,
+            models.ImportJob.result: res.model_dump(mode="json"),
+            models.ImportJob.finished_on: datetime.now(),
+        })
+        db.commit()
+    finally:
+        db.close()
+
+@app.post('/imports')
+def submit_import(entry: schemas.MatchyUploadEntry, db: DbDep, request: Request, current_user = Depends(get_current_employee)):
+    limit_rate("imports", request, getattr(current_user, "email", None))
+    entry_error = check_upload_entry(entry)
+    if entry_error:
+        return entry_error
+
+    job = add_import_job(db, len(entry.lines) - entry.startLine, get_worker_id())
+    db.commit()
+
+    import_executor.submit(run_import_job, job.id, entry.lines, entry.forceUpload, entry.chunkSize or settings.import_chunk_size, entry.startLine)
+
+    return import_job_out(job, "import submitted", 202)
+
+@app.get('/imports/{id}', response_model=schemas.ImportJobOut)
+def get_import(id: int, db: DbDep, current_user = Depends(get_current_employee)):
+    job = get_import_job(db, id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import not found")
+
+    return import_job_out(job, f"import {job.status.value.lower()}", 200)
+
+@app.get('/imports/reports/{id}', response_model=schemas.ImportReportOut)
+def get_import_report_page(id: int, db: DbDep, pagination_param: paginationParams, current_user = Depends(get_current_employee)):
+    report = get_import_report(db, id)
+    if not report:
+        raise HTTPException(status_code=404, detail="Import report not found")
+
+    first = (pagination_param.page_number - 1) * pagination_param.page_size
+    return schemas.ImportReportOut(
+        status_code=200,
+        detail="Import report",
+        error_count=report.error_count,
+        warning_count=report.warning_count,
+        wrong_cell_count=report.wrong_cell_count,
+        issues=report.issues[first:first + pagination_param.page_size],
+        page_number=pagination_param.page_number,
+        page_size=pagination_param.page_size,
+        total_pages=div_ceil(len(report.issues), pagination_param.page_size),
+        total_records=len(report.issues),
+    )
+
+# cell of an uploaded csv/xlsx file, same attributes as schemas.MatchyCell without a pydantic model per cell
+UploadedCell = namedtuple("UploadedCell", ["value", "rowIndex", "colIndex"])
+
+def xlsx_cell_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+
+    return str(value)
+
+def read_uploaded_rows(file: UploadFile):
+    """
+    yields the rows of a csv or xlsx file (header first) as lists of strings, one at a time
+    the request body is spooled to a temporary file by starlette, it's never loaded in memory
+    """
+    if file.filename and file.filename.lower().endswith('.xlsx'):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise HTTPException(status_code=415, detail="xlsx files are not supported, openpyxl is not installed")
+
+        workbook = load_workbook(file.file, read_only=True, data_only=True)
+        try:
+            for values in workbook.active.iter_rows(values_only=True):
+                yield [xlsx_cell_value(value) for value in values]
+        finally:
+            workbook.close()
+    else:
+        yield from csv.reader(io.TextIOWrapper(file.file, encoding='utf-8-sig', newline=''))
+
+def map_uploaded_header(header: list, mapping: dict):
+    # header => {field: column index}, by the given mapping or else by field name or display name
+    known_names = {
+        **{field.lower(): field for field in possible_fields},
+        **{display_name.lower(): field for field, display_name in field_display_names.items()},
+    }
+    columns = {}
+    for col, name in enumerate(header):
+        field = mapping.get(name) or known_names.get(name.strip().lower())
+        if field in possible_fields:
+            columns[field] = col
+
+    return columns
+
+def uploaded_employees_chunks(rows: Iterator, columns: dict, chunk_size: int, start_line: int):
+    # empty rows are skipped and not counted as lines
+    chunk = []
+    line = 0
+    for values in rows:
+        if not any(value.strip() for value in values):
+            continue
+        if line >= start_line:
+            chunk.append({field: UploadedCell(values[col] if col < len(values) else '', line, col) for field, col in columns.items()})
+        line += 1
+
+        if len(chunk) == chunk_size:
+            yield line - len(chunk), chunk
+            chunk = []
+
+    if chunk:
+        yield line - len(chunk), chunk
+
+@app.post('/upload')
+def upload_file(
+    file: UploadFile,
+    db: DbDep,
+    request: Request,
+    mapping: Annotated[str | None, Form()] = None, # json {"file header": "field"}, default: headers named like the fields
+    forceUpload: Annotated[bool, Form()] = False,
+    chunkSize: Annotated[int | None, Form()] = None,
+    startLine: Annotated[int, Form()] = 0,
+    current_user = Depends(get_current_employee),
+):
+    """
+    streaming import of a csv or xlsx file: rows are read and validated chunk by chunk
+    (each chunk committed), so memory depends on chunkSize and not on the file size
+    """
+    limit_rate("imports", request, getattr(current_user, "email", None))
+    chunk_size = chunkSize or settings.import_chunk_size
+    if chunk_size < 0 or startLine < 0:
+        return schemas.BaseOut(status_code=400, detail="chunkSize and startLine should be >= 0")
+
+    try:
+        mapping = json.loads(mapping) if mapping else {}
+    except ValueError:
+        mapping = None
+    if not isinstance(mapping, dict):
+        return schemas.BaseOut(status_code=400, detail="mapping should be a json object {header: field}")
+
+    rows = read_uploaded_rows(file)
+    header = next(rows, None)
+    if header is None:
+        return schemas.BaseOut(status_code=400, detail="Nothing to do, empty file")
+
+    columns = map_uploaded_header(header, mapping)
+    missing_fields_error = check_mandatory_fields(columns.keys())
+    if missing_fields_error:
+        return missing_fields_error
+
+    return valid_employees_data_and_upload_by_chunks(
+        uploaded_employees_chunks(rows, columns, chunk_size, startLine), forceUpload, startLine, db,
+    )
+
@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Depends
+
+from app.OAuth2 import get_hashing_metrics, principal_cache
+from app.database import get_pool_metrics
+from app.dependencies import get_current_employee
+from app.external_services.emailService import get_email_metrics
+
+app = APIRouter(
+    prefix="/metrics",
+    tags=["Metrics"],
+)
+
+@app.get("/")
+def get_metrics(current_user = Depends(get_current_employee)):
+    return {
+        "hashing": get_hashing_metrics(),
+        "principal_cache": principal_cache.stats(),
+        "database": get_pool_metrics(),
+        "email": get_email_metrics(),
+    }
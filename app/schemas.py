@@ -1,6 +1,6 @@
 from datetime import datetime, date
 from pydantic import BaseModel, EmailStr
-from app.enums import ContractType, Gender, RoleType
+from app.enums import ContractType, EmailStatus, EmailTemplate, Gender, JobStatus, RoleType
 from typing import List, Optional, Dict
 
 from app.enums.matchyComparer import Comparer
@@ -54,8 +54,17 @@ class EmployeeOut(EmployeeBase):
     created_on: datetime
 
 class EmployeesOut(PagedResponse):
+    # cursor mode: no page number and no count, next_cursor None on the last page
+    page_number: int | None = None
+    total_pages: int | None = None
+    total_records: int | None = None
+    next_cursor: str | None = None
+    total_records_exact: bool | None = None # False: planner estimate (count=Estimated)
     list: List[EmployeeOut]
 
+class RevokeToken(OurBaseModel):
+    token: str
+
 class ConfirmAccount(OurBaseModel):
     confirmation_code: str
 
@@ -91,6 +100,8 @@ class MatchyCell(OurBaseModel):
 class MatchyUploadEntry(OurBaseModel):
     lines: List[Dict[str, MatchyCell]] # [ {cnss_number: {40, 1, 1}, {roles: {Admin, vendor, 1, 2}}, {emp 2}, {emp 3}] # enou emp lkol en tant que dict 3andhom nafs l keys
     forceUpload: Optional[bool] = False
+    chunkSize: Optional[int] = None # commit every chunkSize lines, None => one transaction for the whole file
+    startLine: Optional[int] = 0 # first line imported: resume an import from the checkpoint of a previous call
 
 class MatchyWrongCell(OurBaseModel):
     message: str
@@ -100,4 +111,55 @@ class MatchyWrongCell(OurBaseModel):
 class ImportResponse(BaseOut):
     errors: Optional[str] = None
     warnings: Optional[str] = None
-    wrong_cells: Optional[list[MatchyWrongCell]] = []
\ No newline at end of file
+    wrong_cells: Optional[list[MatchyWrongCell]] = []
+    # set when there are too many issues: errors, warnings and wrong_cells only hold the first ones
+    report_id: Optional[int] = None
+    error_count: Optional[int] = None
+    warning_count: Optional[int] = None
+    wrong_cell_count: Optional[int] = None
+
+class ImportChunkResponse(ImportResponse):
+    first_line: int
+    last_line: int
+
+class ChunkedImportResponse(ImportResponse):
+    checkpoint: int # number of lines already committed, send it back as startLine to resume
+    chunks: list[ImportChunkResponse] = []
+
+class ImportIssueGroup(OurBaseModel):
+    kind: str # error, warning or cell
+    message: str
+    colIndex: Optional[int] = None # cells only
+    ranges: list[list[int]] # [first, last]: lines for errors and warnings, rowIndex for cells
+    count: int
+
+class ImportReportOut(PagedResponse):
+    error_count: int
+    warning_count: int
+    wrong_cell_count: int
+    issues: list[ImportIssueGroup]
+
+class ImportJobOut(BaseOut):
+    id: int
+    job_status: JobStatus
+    total_lines: int
+    processed_lines: int
+    added_lines: int
+    created_on: datetime
+    finished_on: datetime | None = None
+    result: Optional[ChunkedImportResponse] = None # report (errors, warnings, wrong_cells) once finished
+
+class EmailOut(OurBaseModel):
+    # no body: it holds activation/reset codes
+    id: int
+    recipients: List[str]
+    template: EmailTemplate
+    status: EmailStatus
+    attempts: int
+    next_attempt_on: datetime
+    last_error: Optional[str] = None
+    created_on: datetime
+    sent_on: Optional[datetime] = None
+
+class EmailsOut(PagedResponse):
+    list: List[EmailOut]
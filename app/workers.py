@@ -0,0 +1,55 @@
+import multiprocessing
+import os
+import socket
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from .config import settings
+
+# local pool running the import jobs, no broker needed: jobs state is kept in the import_jobs table
+import_executor = ThreadPoolExecutor(max_workers=settings.import_workers, thread_name_prefix="import-job")
+
+# bcrypt (~250ms per hash) runs here instead of blocking the event loop
+hashing_executor = ThreadPoolExecutor(max_workers=settings.hashing_workers, thread_name_prefix="bcrypt")
+
+# parallel validation of big imports: long lived processes forked by the app lifespan before any thread exists
+# forking later (per import) copies a process where other threads (event loop, threadpools, bcrypt) may hold locks
+# the children would then wait forever. not available on windows => validation stays in process
+fork_context = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+validation_executor: ProcessPoolExecutor | None = None
+
+def init_validation_process():
+    # the children never use the database: forget the inherited pools without closing the sockets of the parent
+    from .database import async_engine, engine, replica_engine
+    for inherited_engine in (engine, async_engine.sync_engine, replica_engine):
+        if inherited_engine is not None:
+            inherited_engine.dispose(close=False)
+
+def start_validation_executor():
+    global validation_executor
+    if settings.validation_processes > 1 and fork_context:
+        validation_executor = ProcessPoolExecutor(settings.validation_processes, mp_context=fork_context, initializer=init_validation_process)
+        # with fork, every process is started on the first submit: now, while this process has a single thread
+        validation_executor.submit(os.getpid).result()
+
+def shutdown_validation_executor():
+    global validation_executor
+    if validation_executor:
+        validation_executor.shutdown(wait=False, cancel_futures=True)
+        validation_executor = None
+
+def get_worker_id():
+    # read at call time: workers forked from a preloaded app share the module but not the pid
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def is_worker_alive(worker_id: str):
+    # only answers for the workers of this host, the others are judged by their heartbeat
+    host, _, pid = worker_id.rpartition(":")
+    if host != socket.gethostname():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, ValueError):
+        return True
+    return True
@@ -0,0 +1,75 @@
+"""
+requests/second of concurrent async handlers waiting for the database: with the sync session
+(what the async def handlers did before AsyncDbDep: every query blocks the event loop) against
+the async session, and the event loop lag seen meanwhile by an unrelated coroutine
+each request runs one statement taking --query-ms on the server (SELECT pg_sleep), nothing is written
+
+against the database of the settings (.env, postgres: sync and asyncpg engines of app.database):
+    python -m scripts.benchmark_async_db --requests 10 50 200 --query-ms 20
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import text
+
+from app.database import AsyncSessionLocal, SessionLocal, async_engine
+from app.config import settings
+
+
+async def blocking_request(seconds: float):
+    db = SessionLocal()
+    try:
+        db.execute(text("SELECT pg_sleep(:seconds)"), {"seconds": seconds})
+    finally:
+        db.close()
+
+async def async_request(seconds: float):
+    async with AsyncSessionLocal() as db:
+        await db.execute(text("SELECT pg_sleep(:seconds)"), {"seconds": seconds})
+
+async def burst(request, requests: int, seconds: float):
+    # returns (wall seconds, max event loop lag seconds)
+    lags = [0.0]
+    done = asyncio.Event()
+
+    async def probe():
+        while not done.is_set():
+            started_on = time.perf_counter()
+            await asyncio.sleep(0.005)
+            lags.append(time.perf_counter() - started_on - 0.005)
+
+    probe_task = asyncio.create_task(probe())
+    await asyncio.sleep(0) # the probe is waiting before the requests start
+    started_on = time.perf_counter()
+    await asyncio.gather(*(request(seconds) for _ in range(requests)))
+    wall = time.perf_counter() - started_on
+    done.set()
+    await probe_task
+
+    return wall, max(lags)
+
+async def run(args):
+    seconds = args.query_ms / 1000
+    # connections opened before measuring
+    await burst(blocking_request, 1, 0)
+    await burst(async_request, settings.db_pool_size, 0)
+
+    print(f"{args.query_ms:.0f}ms per query, pool of {settings.db_pool_size} (+{settings.db_max_overflow} overflow) per engine")
+    print(f"{'requests':>8} {'session':<9} {'wall ms':>8} {'req/s':>8} {'max loop lag ms':>16}")
+    try:
+        for requests in args.requests:
+            for name, request in (("sync", blocking_request), ("async", async_request)):
+                wall, lag = await burst(request, requests, seconds)
+                print(f"{requests:>8} {name:<9} {wall * 1000:>8.0f} {requests / wall:>8.1f} {lag * 1000:>16.1f}")
+    finally:
+        await async_engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, nargs="+", default=[10, 50, 200], help="concurrent requests per burst")
+    parser.add_argument("--query-ms", type=float, default=20)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+rows/second of add_imported_employees: the orm path (add_all + flush, used below bulk_insert_min_rows)
+against the bulk path (INSERT ... RETURNING, then COPY FROM STDIN on postgres)
+each run is one transaction rolled back at the end: nothing is kept in the database
+
+against the database of the settings (.env, migrated with alembic upgrade head):
+    python -m scripts.benchmark_bulk_insert --sizes 1000 10000 100000
+against any other database (sqlite: the tables are created, executemany replaces COPY):
+    python -m scripts.benchmark_bulk_insert --database-url sqlite:////tmp/bench.db
+"""
+import argparse
+import sqlite3
+import time
+import uuid
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import database, enums, models
+from app.config import settings
+from app.crud.employee import add_imported_employees
+
+
+def imported_employees(count: int):
+    # same shape as the import handler's employees_data and roles_per_email
+    run = uuid.uuid4().hex[:8]
+    employees_data = [
+        dict(
+            first_name="Bench", last_name=f"Mark {i}", email=f"bench-{run}-{i}@example.com", number=i, password=uuid.uuid1(),
+            birth_date=None, address=None, cnss_number=None, phone_number=None,
+            contract_type=enums.ContractType.Sivp, gender=enums.Gender.Male,
+        )
+        for i in range(count)
+    ]
+    roles_per_email = {employee["email"]: [enums.RoleType.Vendor, enums.RoleType.ADMIN] for employee in employees_data}
+
+    return employees_data, roles_per_email
+
+def measure(Session, count: int, bulk: bool):
+    settings.bulk_insert_min_rows = 0 if bulk else count + 1
+    employees_data, roles_per_email = imported_employees(count)
+    db = Session()
+    try:
+        started_on = time.perf_counter()
+        add_imported_employees(db, employees_data, roles_per_email)
+        db.flush()
+        return count / (time.perf_counter() - started_on)
+    finally:
+        db.rollback()
+        db.close()
+
+def get_engine(database_url: str | None):
+    if not database_url:
+        return database.engine
+
+    engine = create_engine(database_url)
+    if engine.dialect.name == "sqlite":
+        # the imported employees get an uuid as temporary password (psycopg2 adapts it, sqlite3 doesn't)
+        sqlite3.register_adapter(uuid.UUID, str)
+        employees = models.Employee.__table__
+        # postgres only (regex operator)
+        employees.constraints = {constraint for constraint in employees.constraints if constraint.name != "ck_employees_cnss_number"}
+        models.Base.metadata.create_all(engine)
+
+    return engine
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--database-url", help="sqlalchemy url, the database of the settings by default")
+    args = parser.parse_args()
+
+    engine = get_engine(args.database_url)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    print(f"database: {engine.dialect.name} ({'COPY' if engine.dialect.name == 'postgresql' else 'executemany'} for the roles)")
+    print(f"{'rows':>8} {'orm rows/s':>12} {'bulk rows/s':>12} {'speedup':>8}")
+    for count in args.sizes:
+        orm = measure(Session, count, bulk=False)
+        bulk = measure(Session, count, bulk=True)
+        print(f"{count:>8} {orm:>12.0f} {bulk:>12.0f} {bulk / orm:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+messages/second of the email service against a local SMTP stub (started by the script, AUTH accepted,
+every message dropped): one FastMail and one SMTP session per message (before the pool) against
+send_batch over the pooled connections
+--rtt delays every reply of the stub (network round trip), --certfile/--keyfile make it implicit TLS
+
+    python -m scripts.benchmark_email --messages 300 --rtt 0.002
+    python -m scripts.benchmark_email --certfile cert.pem --keyfile key.pem
+"""
+import argparse
+import asyncio
+import ssl
+import time
+
+from fastapi_mail import FastMail, MessageSchema, MessageType
+
+from app.enums.emailTemplate import EmailTemplate
+from app.external_services import emailService
+from app.external_services.emailService import conf, send_batch, smtp_pool, template_name_per_template
+
+
+class SMTPStub:
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.connections = 0
+        self.messages = 0
+
+    async def reply(self, writer: asyncio.StreamWriter, line: str):
+        if self.rtt:
+            await asyncio.sleep(self.rtt)
+        writer.write(f"{line}\r\n".encode())
+        await writer.drain()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            await self.reply(writer, "220 stub")
+            while line := (await reader.readline()).decode().strip():
+                command = line.split(" ")[0].upper()
+                if command == "EHLO":
+                    await self.reply(writer, "250-stub\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME")
+                elif command == "AUTH":
+                    await self.reply(writer, "235 authenticated")
+                elif command == "DATA":
+                    await self.reply(writer, "354 go on")
+                    while await reader.readline() not in (b".\r\n", b".\n", b""):
+                        pass
+                    self.messages += 1
+                    await self.reply(writer, "250 queued")
+                elif command == "QUIT":
+                    await self.reply(writer, "221 bye")
+                    break
+                else: # HELO, MAIL, RCPT, RSET, NOOP
+                    await self.reply(writer, "250 ok")
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+def emails(count: int):
+    return [([f"user{i}@example.com"], {"name": f"User {i}", "code": f"code-{i}", "psw": "password"}, EmailTemplate.ConfirmAccount) for i in range(count)]
+
+async def per_message(batch: list):
+    # the service before the pool: a new FastMail (smtp session and login) per message
+    for recipients, body, template in batch:
+        message = MessageSchema(subject="Fastapi-Mail module", recipients=recipients, template_body=body, subtype=MessageType.html)
+        await FastMail(conf).send_message(message, template_name=template_name_per_template[template])
+
+async def measure(stub: SMTPStub, send, batch: list):
+    connections, messages = stub.connections, stub.messages
+    started_on = time.perf_counter()
+    await send(batch)
+    return len(batch) / (time.perf_counter() - started_on), stub.connections - connections, stub.messages - messages
+
+async def run(args):
+    tls = None
+    if args.certfile:
+        tls = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        tls.load_cert_chain(args.certfile, args.keyfile)
+
+    stub = SMTPStub(args.rtt)
+    server = await asyncio.start_server(stub.handle, "127.0.0.1", 0, ssl=tls)
+    # the service is pointed at the stub
+    conf.MAIL_SERVER, conf.MAIL_PORT = "127.0.0.1", server.sockets[0].getsockname()[1]
+    conf.MAIL_SSL_TLS, conf.MAIL_STARTTLS, conf.VALIDATE_CERTS = bool(tls), False, False
+    conf.USE_CREDENTIALS, conf.SUPPRESS_SEND = True, 0
+
+    batch = emails(args.messages)
+    print(f"{args.messages} messages, stub rtt {args.rtt * 1000:.1f}ms{', tls' if tls else ''}, pool of {smtp_pool.size}")
+    print(f"{'path':<12} {'msg/s':>8} {'connections':>12} {'delivered':>10}")
+    try:
+        for name, send in (("per message", per_message), ("send_batch", send_batch)):
+            rate, connections, delivered = await measure(stub, send, batch)
+            print(f"{name:<12} {rate:>8.1f} {connections:>12} {delivered:>10}")
+        print("metrics", emailService.get_email_metrics())
+    finally:
+        await smtp_pool.close_all()
+        server.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=300)
+    parser.add_argument("--rtt", type=float, default=0, help="seconds before every reply of the stub")
+    parser.add_argument("--certfile")
+    parser.add_argument("--keyfile")
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
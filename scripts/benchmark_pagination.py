@@ -0,0 +1,86 @@
+"""
+/employee/all queries on a big employees table: a first and a deep page with page_number (count + OFFSET)
+against the same pages with the keyset cursor (no count)
+the employees are inserted in one transaction rolled back at the end: nothing is kept in the database
+
+against the database of the settings (.env, migrated with alembic upgrade head):
+    python -m scripts.benchmark_pagination --rows 1000000 --page 10000
+against any other database (sqlite: the tables are created):
+    python -m scripts.benchmark_pagination --database-url sqlite:////tmp/bench.db
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, text
+from sqlalchemy.orm import sessionmaker
+
+from app import enums, models
+from app.crud.employee import decode_cursor, employees_count_cache, employees_query, encode_cursor, get_employees, get_employees_after
+from app.dependencies import PagiantionParams
+from scripts.benchmark_bulk_insert import get_engine
+
+
+def insert_employees(db, count: int, batch_size: int = 10000):
+    # imported employees: a thousand share each created_on, id breaks the ties
+    first_created_on = datetime(2020, 1, 1)
+    for first in range(0, count, batch_size):
+        db.execute(insert(models.Employee.__table__), [
+            dict(
+                first_name="Bench", last_name=f"Mark {i}", email=f"bench-{i}@example.com", number=i,
+                contract_type=enums.ContractType.Sivp, gender=enums.Gender.Male, account_status=enums.AccountStatus.Active,
+                created_on=first_created_on + timedelta(seconds=i // 1000),
+            )
+            for i in range(first, min(first + batch_size, count))
+        ])
+
+def measure(db, query, runs: int):
+    # best of the runs in ms, counts not cached
+    best = None
+    for _ in range(runs):
+        employees_count_cache.clear()
+        started_on = time.perf_counter()
+        query()
+        duration = (time.perf_counter() - started_on) * 1000
+        best = duration if best is None else min(best, duration)
+
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--page", type=int, default=10000, help="deep page number")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--database-url", help="sqlalchemy url, the database of the settings by default")
+    args = parser.parse_args()
+
+    engine = get_engine(args.database_url)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        started_on = time.perf_counter()
+        insert_employees(db, args.rows)
+        if engine.dialect.name == "postgresql":
+            db.execute(text("ANALYZE employees"))
+        print(f"database: {engine.dialect.name}, {args.rows} employees inserted in {time.perf_counter() - started_on:.0f}s, page size {args.page_size}, best of {args.runs}")
+
+        # cursor of the last employee before the deep page, as the previous page would give it
+        previous = employees_query(db, None).offset(args.page_size * (args.page - 1) - 1).first()
+        deep_cursor = decode_cursor(encode_cursor(previous))
+        # both modes give the same page
+        offset_page = get_employees(db, PagiantionParams(args.page_size, args.page), None)[0]
+        assert [row.id for row in offset_page] == [row.id for row in get_employees_after(db, args.page_size, None, deep_cursor)[0]]
+
+        for label, query in (
+            ("page_number=1", lambda: get_employees(db, PagiantionParams(args.page_size, 1), None)),
+            (f"page_number={args.page}", lambda: get_employees(db, PagiantionParams(args.page_size, args.page), None)),
+            ("cursor first page", lambda: get_employees_after(db, args.page_size, None, None)),
+            (f"cursor page {args.page}", lambda: get_employees_after(db, args.page_size, None, deep_cursor)),
+        ):
+            print(f"{label:<22} {measure(db, query, args.runs):>9.1f} ms")
+    finally:
+        db.rollback()
+        db.close()
+
+if __name__ == "__main__":
+    main()
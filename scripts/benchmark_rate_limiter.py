@@ -0,0 +1,58 @@
+"""
+overhead of the rate limiter per request: the store's hit, limit_rate with its two checks (ip and account),
+allowed and refused (429), next to a trivial request through the app (GET /employee/possibleFields, no database)
+in process, no server nor database needed
+
+    python -m scripts.benchmark_rate_limiter --checks 200000 --clients 5000
+"""
+import argparse
+import time
+
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+from app import limiter
+from app.config import settings
+from app.main import app
+
+
+def per_call(function, calls: int):
+    # microseconds per call
+    started_on = time.perf_counter()
+    for i in range(calls):
+        function(i)
+
+    return (time.perf_counter() - started_on) / calls * 1e6
+
+def client_request(i: int, clients: int):
+    return Request({"type": "http", "client": (f"10.{i % clients // 65536}.{i % clients // 256 % 256}.{i % 256}", 1), "headers": []})
+
+def refused(request: Request):
+    try:
+        limiter.limit_rate("refused", request, "refused@example.com")
+    except HTTPException:
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--checks", type=int, default=200000)
+    parser.add_argument("--clients", type=int, default=5000, help="distinct ips and accounts, as many keys in the store")
+    parser.add_argument("--requests", type=int, default=1000)
+    args = parser.parse_args()
+
+    # limits never reached except for the refused route
+    settings.rate_limits_per_ip.update(allowed=f"{10 ** 9}/60", refused="1/3600")
+    settings.rate_limits_per_account.update(allowed=f"{10 ** 9}/60", refused="1/3600")
+    store = limiter.MemoryRateLimitStore()
+    requests = [client_request(i, args.clients) for i in range(args.clients)]
+    client = TestClient(app) # no lifespan: no background workers
+
+    print(f"{args.checks} checks over {args.clients} clients")
+    print(f"{'store.hit':<26} {per_call(lambda i: store.hit(f'allowed:ip:{i % args.clients}', 10 ** 9, 60), args.checks):>8.2f} us")
+    print(f"{'limit_rate allowed':<26} {per_call(lambda i: limiter.limit_rate('allowed', requests[i % args.clients], f'user{i % args.clients}@example.com'), args.checks):>8.2f} us")
+    print(f"{'limit_rate refused (429)':<26} {per_call(lambda i: refused(requests[0]), args.checks):>8.2f} us")
+    print(f"{'GET /employee/possibleFields':<26} {per_call(lambda i: client.get('/employee/possibleFields'), args.requests):>8.2f} us")
+
+if __name__ == "__main__":
+    main()
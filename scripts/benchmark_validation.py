@@ -0,0 +1,126 @@
+"""
+lines/second of the Matchy upload validation on a synthetic file (11 columns, some wrong emails):
+the former line by line validation (validate_employee_data, reproduced below as the reference)
+against the column plan (validate_employees_data, in process, validation cache emptied before each run)
+no database needed
+
+    python -m scripts.benchmark_validation --lines 100000 --wrong-emails 0.02
+"""
+import argparse
+import re
+import time
+
+from app import enums, schemas
+from app.routers import employee as router
+from app.routers.employee import validation_cache, validate_employees_data
+
+
+def matchy_lines(count: int, wrong_emails: float):
+    # same cells as a /employee/test entry
+    wrong_every = round(1 / wrong_emails) if wrong_emails else 0
+    genders = ["Male", "female", "MALE"]
+    contract_types = ["Cdi", "Sivp", "cdd", "Apprenti"]
+    lines = []
+    for i in range(count):
+        values = dict(
+            first_name="First", last_name=f"Last {i}", email="wrong" if wrong_every and i % wrong_every == 0 else f"user{i}@mail.com.tn",
+            number=str(i), birth_date=f"19{80 + i % 20}-0{1 + i % 9}-1{i % 9}", address="Address", cnss_number=f"{i:08d}-12",
+            contract_type=contract_types[i % 4], gender=genders[i % 3], employee_roles="Vendor,ADMIN", phone_number="12345678",
+        )
+        lines.append({field: schemas.MatchyCell(value=value, rowIndex=i, colIndex=col) for col, (field, value) in enumerate(values.items())})
+
+    return lines
+
+# reference: one line at a time, every rule dispatched per cell, enums scanned
+def enum_value(enum, field: str):
+    for val in enum:
+        if field.strip().upper() == val.value.upper():
+            return val
+
+    return None
+
+def roles_value(field: str):
+    res = []
+    for role_name in field.split(','):
+        val = enum_value(enums.RoleType, role_name)
+        if not val:
+            return None
+        res.append(val)
+
+    return res
+
+line_checks = {
+    "email": lambda field: field if re.match(router.email_regex, field) else None,
+    "gender": lambda field: enum_value(enums.Gender, field),
+    "contract_type": lambda field: enum_value(enums.ContractType, field),
+    "number": router.is_positive_int,
+    "birth_date": router.is_valid_date,
+    "cnss_number": lambda field: field if re.match(router.cnss_regex, field) else None,
+    "phone_number": lambda field: field if re.match(router.phone_number_regex, field) else None,
+    "employee_roles": roles_value,
+}
+
+def validate_employee_data(employee: dict):
+    errors = []
+    warnings = []
+    wrong_cells = []
+    employee_to_add = {field: cell.value for field, cell in employee.items()}
+
+    for field in router.possible_fields:
+        if field not in employee:
+            if router.is_field_mandatory(employee, field):
+                errors.append(f"{router.field_display_names[field]} is mandatory but missing")
+            continue
+
+        cell = employee[field]
+        employee_to_add[field] = employee_to_add[field].strip()
+        if employee_to_add[field] == '':
+            if router.is_field_mandatory(employee, field):
+                msg = f"{router.field_display_names[field]} is mandatory but missing"
+                errors.append(msg)
+                wrong_cells.append(schemas.MatchyWrongCell(message=msg, rowIndex=cell.rowIndex, colIndex=cell.colIndex))
+            else:
+                employee_to_add[field] = None
+        elif field in line_checks:
+            converted_val = line_checks[field](employee_to_add[field])
+            if converted_val is None:
+                msg = router.fields_check[field][1]
+                (errors if router.is_field_mandatory(employee, field) else warnings).append(msg)
+                wrong_cells.append(schemas.MatchyWrongCell(message=msg, rowIndex=cell.rowIndex, colIndex=cell.colIndex))
+            else:
+                employee_to_add[field] = converted_val
+
+    return (errors, warnings, wrong_cells, employee_to_add)
+
+def measure(validate, lines: list, runs: int):
+    # best of the runs
+    best = None
+    for _ in range(runs):
+        validation_cache.clear()
+        started_on = time.perf_counter()
+        result = validate(lines)
+        duration = time.perf_counter() - started_on
+        best = duration if best is None else min(best, duration)
+
+    return len(lines) / best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=100000)
+    parser.add_argument("--wrong-emails", type=float, default=0.02, help="share of the lines with a wrong email")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    lines = matchy_lines(args.lines, args.wrong_emails)
+    by_line, line_results = measure(lambda lines: [validate_employee_data(line) for line in lines], lines, args.runs)
+    by_column, (errors, warnings, wrong_cells, _) = measure(validate_employees_data, lines, args.runs)
+    # same issues found by both
+    assert sum(bool(result[0]) for result in line_results) == len({line for line, _ in errors})
+    assert sum(len(result[2]) for result in line_results) == len(wrong_cells)
+
+    print(f"{args.lines} lines, {len(wrong_cells)} wrong cells")
+    print(f"{'line by line':<14} {by_line:>10.0f} lines/s")
+    print(f"{'column plan':<14} {by_column:>10.0f} lines/s {by_column / by_line:>6.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+latency of an unrelated endpoint (probed at a fixed interval) while bursts of logins hash passwords
+a burst of 0 logins gives the baseline; 503 logins are the hashing back-pressure (hashing_max_pending)
+
+against a started app having an active employee with this email and password, without login rate limits
+(else the bursts get 429 before reaching bcrypt):
+    RATE_LIMITS_PER_IP='{}' RATE_LIMITS_PER_ACCOUNT='{}' uvicorn app.main:app
+    python -m scripts.load_test_login_burst --base-url http://localhost:8000 --email a@b.com --password secret --logins 0 4 10 20
+"""
+import argparse
+import asyncio
+import time
+from collections import Counter
+
+import httpx
+
+
+def percentile(values: list, share: float):
+    values = sorted(values)
+    return values[min(int(len(values) * share), len(values) - 1)]
+
+async def burst(client: httpx.AsyncClient, args, logins: int):
+    latencies = []
+    done = asyncio.Event()
+
+    async def probe():
+        while not done.is_set():
+            started_on = time.perf_counter()
+            await client.get(args.probe_path)
+            latencies.append(time.perf_counter() - started_on)
+            await asyncio.sleep(args.probe_interval)
+
+    async def login():
+        response = await client.post("/token", data={"username": args.email, "password": args.password})
+        return response.status_code
+
+    probe_task = asyncio.create_task(probe())
+    started_on = time.perf_counter()
+    if logins:
+        statuses = Counter(await asyncio.gather(*[login() for _ in range(logins)]))
+    else:
+        statuses = Counter()
+        await asyncio.sleep(args.baseline_seconds)
+    duration = time.perf_counter() - started_on
+    done.set()
+    await probe_task
+
+    return duration, statuses, latencies
+
+async def run(args):
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout) as client:
+        print(f"probe: GET {args.probe_path} every {args.probe_interval * 1000:.0f}ms")
+        print(f"{'logins':>6} {'duration':>9} {'statuses':<20} {'probes':>6} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        for logins in args.logins:
+            duration, statuses, latencies = await burst(client, args, logins)
+            print(
+                f"{logins:>6} {duration:>8.2f}s {', '.join(f'{status}: {count}' for status, count in sorted(statuses.items())) or '-':<20} {len(latencies):>6}"
+                f" {percentile(latencies, 0.5) * 1000:>8.1f} {percentile(latencies, 0.99) * 1000:>8.1f} {max(latencies) * 1000:>8.1f}"
+            )
+            if statuses[429]:
+                print("       429: the logins were rate limited, not hashed: start the app without token rate limits")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--logins", type=int, nargs="+", default=[0, 4, 10, 20], help="burst sizes, 0 => baseline")
+    parser.add_argument("--probe-path", default="/employee/possibleFields")
+    parser.add_argument("--probe-interval", type=float, default=0.02, help="seconds")
+    parser.add_argument("--baseline-seconds", type=float, default=2)
+    parser.add_argument("--timeout", type=float, default=60)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import os
+import sqlite3
+import uuid
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+# settings without default: the app is imported with these, the database is replaced by sqlite below
+for name, value in {
+    "DATABASE_HOSTNAME": "localhost", "DATABASE_PORT": "5432", "DATABASE_PASSWORD": "test", "DATABASE_NAME": "test", "DATABASE_USERNAME": "test",
+    "MAIL_USERNAME": "test", "MAIL_PASSWORD": "test", "MAIL_FROM": "test@example.com", "MAIL_SERVER": "localhost",
+    "SECRET_KEY": "test", "ALGORITHM": "HS256", "ACCESS_TOKEN_EXPIRE_MIN": "30",
+}.items():
+    os.environ.setdefault(name, value)
+
+from fastapi.testclient import TestClient
+
+from app import database, models
+from app.dependencies import get_current_employee
+from app.main import app
+
+sqlite3.register_adapter(uuid.UUID, str)
+
+
+@pytest.fixture
+def db_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    employees = models.Employee.__table__
+    # postgres only (regex operator)
+    cnss_check = next(constraint for constraint in employees.constraints if constraint.name == "ck_employees_cnss_number")
+    employees.constraints.discard(cnss_check)
+    try:
+        models.Base.metadata.create_all(engine)
+    finally:
+        employees.constraints.add(cnss_check)
+
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def db_session(db_engine):
+    session = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)()
+    yield session
+    session.close()
+
+@pytest.fixture
+def client(db_engine):
+    TestSession = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)
+
+    def get_test_db():
+        db = TestSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[database.get_db] = get_test_db
+    app.dependency_overrides[database.get_read_db] = get_test_db
+    app.dependency_overrides[get_current_employee] = lambda: None
+    yield TestClient(app) # no lifespan: no background workers
+    app.dependency_overrides.clear()
+
+@pytest.fixture
+def query_counter(db_engine):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db_engine, "before_cursor_execute", count)
+    yield statements
+    event.remove(db_engine, "before_cursor_execute", count)
@@ -0,0 +1,66 @@
+import pytest
+
+from app import enums, models
+from app.crud.employee import employees_count_cache
+from app.crud.version import EMPLOYEES, bump_table_version, table_versions_cache
+
+
+@pytest.fixture
+def employees(db_session):
+    for i in range(60):
+        employee = models.Employee(
+            first_name="First", last_name=f"Last {i}", email=f"employee{i}@example.com", number=i,
+            contract_type=enums.ContractType.Sivp, gender=enums.Gender.Male, account_status=enums.AccountStatus.Active,
+        )
+        db_session.add(employee)
+        db_session.flush()
+        db_session.add_all([models.EmployeeRole(employee_id=employee.id, role=role) for role in (enums.RoleType.Vendor, enums.RoleType.ADMIN)[:i % 2 + 1]])
+    db_session.commit()
+
+def get_page(client, query_counter, **params):
+    # cold caches: every request pays the version and count queries
+    employees_count_cache.clear()
+    table_versions_cache.clear()
+    query_counter.clear()
+    response = client.get("/employee/all", params=params)
+    assert response.status_code == 200
+
+    return response.json(), len(query_counter)
+
+def test_page_query_count_does_not_depend_on_page_size(client, query_counter, employees):
+    small_page, small_page_queries = get_page(client, query_counter, page_size=5)
+    big_page, big_page_queries = get_page(client, query_counter, page_size=50)
+
+    assert len(small_page["list"]) == 5
+    assert len(big_page["list"]) == 50
+    assert small_page_queries == big_page_queries
+    # table version, count, page, roles of the page
+    assert big_page_queries == 4
+
+def test_cursor_page_query_count_does_not_depend_on_page_size(client, query_counter, employees):
+    small_page, small_page_queries = get_page(client, query_counter, page_size=5, cursor="")
+    big_page, big_page_queries = get_page(client, query_counter, page_size=50, cursor="")
+
+    assert len(small_page["list"]) == 5
+    assert len(big_page["list"]) == 50
+    assert small_page_queries == big_page_queries
+
+def test_page_roles(client, query_counter, employees):
+    page, _ = get_page(client, query_counter, page_size=50)
+
+    roles_per_email = {employee["email"]: sorted(employee["roles"]) for employee in page["list"]}
+    assert roles_per_email["employee0@example.com"] == [enums.RoleType.Vendor.value]
+    assert roles_per_email["employee1@example.com"] == sorted([enums.RoleType.Vendor.value, enums.RoleType.ADMIN.value])
+
+def test_write_changes_the_etag(client, db_session, employees):
+    # create_all database: no table_versions row until the first write
+    table_versions_cache.clear()
+    etag = client.get("/employee/all").headers["ETag"]
+    assert client.get("/employee/all", headers={"If-None-Match": etag}).status_code == 304
+
+    bump_table_version(db_session, EMPLOYEES)
+    db_session.commit()
+    response = client.get("/employee/all", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag